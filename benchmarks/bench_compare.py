@@ -0,0 +1,76 @@
+"""
+Compares two sets of results written by bench_endpoints.py, such as from
+before and after a change, printing the median latency and response size of
+each request in both and the ratio between them.
+
+    poetry run python benchmarks/bench_compare.py before.json after.json
+"""
+
+import argparse
+import json
+
+
+def load(path):
+    with open(path) as f:
+        report = json.load(f)
+    return report, {result["name"]: result for result in report["results"]}
+
+
+def ratio(new, old):
+    return new / old if old else float("nan")
+
+
+def compare(old_path, new_path, threshold=0.1):
+    old_report, old = load(old_path)
+    new_report, new = load(new_path)
+    if old_report["dataset"] != new_report["dataset"]:
+        print("Warning: the results were measured on different datasets")
+
+    print(
+        "{:45} {:>10} {:>10} {:>7} {:>12} {:>12} {:>7}".format(
+            "request", "old ms", "new ms", "ratio", "old bytes", "new bytes", "ratio"
+        )
+    )
+    changed = 0
+    for name, result in new.items():
+        if name not in old:
+            continue
+        old_ms = old[name]["latency_ms"]["median"]
+        new_ms = result["latency_ms"]["median"]
+        latency = ratio(new_ms, old_ms)
+        if abs(latency - 1) > threshold:
+            changed += 1
+        print(
+            "{:45} {:>10.1f} {:>10.1f} {:>7.2f} {:>12} {:>12} {:>7.2f}".format(
+                name,
+                old_ms,
+                new_ms,
+                latency,
+                old[name]["bytes"],
+                result["bytes"],
+                ratio(result["bytes"], old[name]["bytes"]),
+            )
+        )
+    print(
+        "{} of {} requests changed latency by more than {:.0%}".format(
+            changed, len(new), threshold
+        )
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("old")
+    parser.add_argument("new")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="the relative change in latency to count as a change",
+    )
+    args = parser.parse_args(argv)
+    compare(args.old, args.new, args.threshold)
+
+
+if __name__ == "__main__":
+    main()
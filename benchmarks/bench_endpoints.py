@@ -0,0 +1,272 @@
+"""
+Measures the latency and response size of every API endpoint, with each of
+its filters and output options, against a large synthetic database (see
+synthetic_data.py), and writes the results as JSON so they can be compared
+between commits with bench_compare.py.
+
+By default a temporary PostGIS database is created with testing.postgresql,
+as the test suite does; --db uses an existing, empty database instead.
+Requests are made through the Flask test client, so they include parameter
+parsing, serialization and compression, but not the network. The response
+cache is disabled so every request does its full work; the information
+caches are warmed by the first (discarded) run of each request.
+
+    poetry run python benchmarks/bench_endpoints.py --output results.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import testing.postgresql
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy_sqlschema import maintain_schema
+from salmon_occurrence import salmon_db
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from synthetic_data import Dataset, generate  # noqa: E402
+
+# environment variables that change what is being measured
+CONFIGURATION = [
+    "SCIP_ENGINE",
+    "SCIP_JSON_SERIALIZER",
+    "SCIP_QUERY_PARALLELISM",
+    "SCIP_COMPRESSION_MIN_SIZE",
+    "SQLALCHEMY_QUERY_CACHE_SIZE",
+    "SQLALCHEMY_PREPARE_THRESHOLD",
+]
+
+
+@contextmanager
+def database(uri=None):
+    if uri:
+        yield uri
+        return
+    with testing.postgresql.Postgresql() as pg:
+        yield pg.url()
+
+
+def create_schema(engine):
+    with engine.connect() as connection:
+        connection.execute(text("CREATE EXTENSION IF NOT EXISTS postgis;"))
+        connection.execute(text("CREATE SCHEMA IF NOT EXISTS salmon_geometry;"))
+        connection.execute(text("SET search_path TO salmon_geometry, public;"))
+        salmon_db.Base.metadata.create_all(bind=connection)
+        connection.commit()
+
+
+def sample_geometries(session):
+    """Returns a point inside a watershed, and a polygon covering several
+    watersheds, in EPSG 4326"""
+    with maintain_schema("salmon_geometry, public", session):
+        point, polygon = session.execute(
+            text(
+                "SELECT ST_AsText(ST_Transform(ST_PointOnSurface(boundary), 4326)), "
+                "ST_AsText(ST_Transform(ST_Buffer(outlet, 100000, 16), 4326)) "
+                "FROM region WHERE kind = 'watershed' ORDER BY id "
+                "OFFSET (SELECT count(*) / 2 FROM region WHERE kind = 'watershed') "
+                "LIMIT 1"
+            )
+        ).one()
+    return point, polygon
+
+
+def cases(point, polygon):
+    """Returns (name, path, parameters) for each request to measure"""
+    requests = [("taxon", "/api/taxon", {})]
+
+    region_variants = [
+        ("all", {}),
+        ("overlap point", {"overlap": point}),
+        ("overlap polygon", {"overlap": polygon}),
+        ("species", {"common_name": "Pink"}),
+        ("species subgroup", {"common_name": "Sockeye", "subgroup": "Lake"}),
+        ("zoom 5", {"zoom": 5}),
+        ("zoom 10", {"zoom": 10}),
+        ("precision 5", {"precision": 5}),
+        ("no geometry", {"fields": "name,code,kind"}),
+        ("geojson", {"format": "geojson"}),
+        ("page", {"limit": 100}),
+        ("stream", {"stream": "true"}),
+    ]
+    for kind in ["watershed", "basin", "conservation_unit"]:
+        for name, params in region_variants:
+            requests.append(
+                (
+                    "region {} {}".format(kind, name),
+                    "/api/region",
+                    dict(params, kind=kind),
+                )
+            )
+
+    population_variants = [
+        ("all", {}),
+        ("overlap point", {"overlap": point}),
+        ("overlap polygon", {"overlap": polygon}),
+        ("species", {"common_name": "Chum"}),
+        ("species subgroup", {"common_name": "Pink", "subgroup": "Odd"}),
+        ("name", {"name": "Conservation Unit 1"}),
+        ("zoom 5", {"zoom": 5}),
+        ("precision 5", {"precision": 5}),
+        ("geojson", {"format": "geojson"}),
+        ("page", {"limit": 100}),
+    ]
+    for name, params in population_variants:
+        requests.append(("population {}".format(name), "/api/population", params))
+    return requests
+
+
+def latency_summary(seconds):
+    ms = sorted(s * 1000 for s in seconds)
+    summary = {
+        "min": ms[0],
+        "median": statistics.median(ms),
+        "mean": statistics.fmean(ms),
+        "max": ms[-1],
+    }
+    if len(ms) > 1:
+        summary["p95"] = statistics.quantiles(ms, n=20, method="inclusive")[-1]
+    return summary
+
+
+def measure(client, path, params, repeat):
+    # the first request warms the information caches and isn't counted
+    client.get(path, query_string=params)
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = client.get(
+            path, query_string=params, headers={"Accept-Encoding": "identity"}
+        )
+        response.get_data()
+        seconds.append(time.perf_counter() - start)
+
+    compressed = client.get(
+        path, query_string=params, headers={"Accept-Encoding": "gzip"}
+    )
+    return {
+        "status": response.status_code,
+        "bytes": len(response.get_data()),
+        "compressed_bytes": len(compressed.get_data()),
+        "latency_ms": latency_summary(seconds),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    dataset = Dataset(
+        args.watersheds,
+        args.basins,
+        args.conservation_units,
+        args.vertices,
+        args.populations_per_cu,
+    )
+    with database(args.db) as uri:
+        engine = create_engine(uri)
+        create_schema(engine)
+        session = sessionmaker(bind=engine)()
+        start = time.perf_counter()
+        counts = generate(session, dataset, args.seed)
+        print("Generated {} in {:.0f}s".format(counts, time.perf_counter() - start))
+        point, polygon = sample_geometries(session)
+        session.close()
+
+        os.environ["DB"] = uri
+        os.environ["SCIP_RESPONSE_CACHE_BYTES"] = "0"
+        from scip import get_app, db
+        from scip.api.cache import invalidate_all
+        from scip.api.geometry_store import refresh_geometry_store
+        from scip.api.region_taxon import refresh_region_taxon
+
+        invalidate_all()
+        app = get_app()
+        if args.precompute:
+            with app.app_context():
+                refresh_geometry_store(db.session)
+                refresh_region_taxon(db.session)
+                db.session.commit()
+            invalidate_all()
+
+        client = app.test_client()
+        results = []
+        for name, path, params in cases(point, polygon):
+            if args.filter and args.filter not in name:
+                continue
+            result = measure(client, path, params, args.repeat)
+            results.append(dict(name=name, path=path, params=params, **result))
+            print(
+                "{:45} {:>4} {:>10} bytes {:>10.1f} ms".format(
+                    name,
+                    result["status"],
+                    result["bytes"],
+                    result["latency_ms"]["median"],
+                )
+            )
+        engine.dispose()
+
+    return {
+        "created": datetime.now(timezone.utc).isoformat(),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "dataset": dict(dataset._asdict(), seed=args.seed, rows=counts),
+        "precomputed": args.precompute,
+        "configuration": {
+            name: os.environ[name] for name in CONFIGURATION if name in os.environ
+        },
+        "repeat": args.repeat,
+        "results": results,
+    }
+
+
+def main(argv=None):
+    defaults = Dataset()
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--output", default="bench-results.json")
+    parser.add_argument("--db", help="an existing, empty PostGIS database URL")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--watersheds", type=int, default=defaults.watersheds)
+    parser.add_argument("--basins", type=int, default=defaults.basins)
+    parser.add_argument(
+        "--conservation-units", type=int, default=defaults.conservation_units
+    )
+    parser.add_argument("--vertices", type=int, default=defaults.vertices)
+    parser.add_argument(
+        "--populations-per-cu", type=int, default=defaults.populations_per_cu
+    )
+    parser.add_argument(
+        "--precompute",
+        action="store_true",
+        help="build the precomputed geometry store and region_taxon view first",
+    )
+    parser.add_argument("--filter", help="only run requests whose name contains this")
+    args = parser.parse_args(argv)
+
+    report = run(args)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print("Wrote {} results to {}".format(len(report["results"]), args.output))
+
+
+if __name__ == "__main__":
+    main()
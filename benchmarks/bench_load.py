@@ -0,0 +1,401 @@
+"""
+Replays a log of API requests at a given concurrency, and reports the
+throughput, latency percentiles and error rate of each endpoint, to size
+gunicorn workers and the database pool (see scip._build_engine_options)
+from measurements.
+
+Requests are read from a JSON lines file with one request per line:
+
+    {"method": "GET", "path": "/api/region", "params": {"kind": "watershed"}}
+
+POST parameters are sent as a form, as the front end sends large overlap
+polygons. Requests can also be taken from the GET requests in a web server
+access log, or generated: a mix of taxon, region and population requests,
+with species filters, overlap points inside the data, and large polygons
+POSTed, in the proportions given by MIX.
+
+By default the requests are replayed against the WSGI app in this process,
+connected to a temporary PostGIS database holding a synthetic dataset (see
+synthetic_data.py); --db uses an existing database instead, and --url sends
+the requests over HTTP to a running server, such as gunicorn, so that
+multiple worker processes can be measured.
+
+    poetry run python benchmarks/bench_load.py --concurrency 16 --requests 5000
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from datetime import datetime, timezone
+from http.client import HTTPConnection, HTTPSConnection, HTTPException
+from itertools import count, cycle, islice
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy_sqlschema import maintain_schema
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from synthetic_data import Dataset, TAXONS, generate  # noqa: E402
+from bench_endpoints import CONFIGURATION, create_schema, database  # noqa: E402
+from bench_endpoints import git_commit  # noqa: E402
+
+# the proportion of generated requests of each type
+MIX = {
+    "taxon": 0.1,
+    "region": 0.35,
+    "region overlap": 0.2,
+    "population": 0.15,
+    "population overlap": 0.1,
+    "overlap polygon POST": 0.1,
+}
+
+REGION_KINDS = ["watershed", "basin", "conservation_unit"]
+
+# the request line of an access log entry in common or combined log format
+ACCESS_LOG_REQUEST = re.compile(r'"GET (?P<target>/api/[^ "]*) HTTP/[0-9.]+"')
+
+
+def read_log(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def read_access_log(path):
+    requests = []
+    with open(path) as f:
+        for line in f:
+            match = ACCESS_LOG_REQUEST.search(line)
+            if match:
+                target = urlsplit(match["target"])
+                requests.append(
+                    {
+                        "method": "GET",
+                        "path": target.path,
+                        "params": dict(parse_qsl(target.query)),
+                    }
+                )
+    return requests
+
+
+def sample_overlaps(session, points=200, polygons=20):
+    """Returns points inside regions, and polygons of about a thousand
+    vertices spanning several watersheds, in EPSG 4326"""
+    with maintain_schema("salmon_geometry, public", session):
+        point_rows = session.execute(
+            text(
+                "SELECT ST_AsText(ST_Transform(ST_PointOnSurface(boundary), 4326)) "
+                "FROM region ORDER BY random() LIMIT :n"
+            ),
+            {"n": points},
+        )
+        polygon_rows = session.execute(
+            text(
+                "SELECT ST_AsText(ST_Transform(ST_Buffer(outlet, 50000, 256), 4326)) "
+                "FROM region WHERE kind = 'watershed' ORDER BY random() LIMIT :n"
+            ),
+            {"n": polygons},
+        )
+        return [p for (p,) in point_rows], [p for (p,) in polygon_rows]
+
+
+def species_filter(rng):
+    """Returns species parameters for a random request; half have none"""
+    if rng.random() < 0.5:
+        return {}
+    common_name, _, subgroup = rng.choice(TAXONS)
+    if subgroup and rng.random() < 0.5:
+        return {"common_name": common_name, "subgroup": subgroup}
+    return {"common_name": common_name}
+
+
+def generate_log(number, points, polygons, seed=0):
+    rng = random.Random(seed)
+    kinds = list(MIX)
+    weights = [MIX[kind] for kind in kinds]
+    requests = []
+    for kind in rng.choices(kinds, weights, k=number):
+        method, params = "GET", species_filter(rng)
+        if kind == "taxon":
+            path, params = "/api/taxon", {}
+        elif kind.startswith("region"):
+            path = "/api/region"
+            params["kind"] = rng.choice(REGION_KINDS)
+        else:
+            path = "/api/population"
+        if kind.endswith("overlap"):
+            params["overlap"] = rng.choice(points)
+        if kind == "overlap polygon POST":
+            method = "POST"
+            path = rng.choice(["/api/region", "/api/population"])
+            params = {"overlap": rng.choice(polygons)}
+            if path == "/api/region":
+                params["kind"] = rng.choice(REGION_KINDS)
+        requests.append({"method": method, "path": path, "params": params})
+    return requests
+
+
+class WSGITarget:
+    """Sends requests to a Flask app in this process, with a test client
+    for each thread"""
+
+    def __init__(self, app):
+        self.app = app
+        self.local = threading.local()
+
+    def request(self, method, path, params):
+        if not hasattr(self.local, "client"):
+            self.local.client = self.app.test_client()
+        if method == "POST":
+            response = self.local.client.post(path, data=params)
+        else:
+            response = self.local.client.get(path, query_string=params)
+        return response.status_code, len(response.get_data())
+
+
+class HTTPTarget:
+    """Sends requests to a running server, over a persistent connection for
+    each thread"""
+
+    def __init__(self, url):
+        self.url = urlsplit(url)
+        self.local = threading.local()
+
+    def connection(self):
+        if not hasattr(self.local, "connection"):
+            connection_type = (
+                HTTPSConnection if self.url.scheme == "https" else HTTPConnection
+            )
+            self.local.connection = connection_type(self.url.netloc, timeout=300)
+        return self.local.connection
+
+    def request(self, method, path, params):
+        path = self.url.path.rstrip("/") + path
+        body, headers = None, {}
+        if method == "POST":
+            body = urlencode(params)
+            headers["Content-Type"] = "application/x-www-form-urlencoded"
+        elif params:
+            path = "{}?{}".format(path, urlencode(params))
+        try:
+            connection = self.connection()
+            connection.request(method, path, body, headers)
+            response = connection.getresponse()
+            return response.status, len(response.read())
+        except (OSError, HTTPException):
+            # the connection is broken; the next request opens a new one
+            connection = self.local.__dict__.pop("connection", None)
+            if connection:
+                connection.close()
+            raise
+
+
+def replay(target, requests, concurrency):
+    """Sends the requests, from concurrency threads at once, and returns
+    each one's (method, path, status, bytes, seconds), and the elapsed time.
+    Requests that fail without a response have status None."""
+    requests = list(requests)
+    results = [None] * len(requests)
+    numbers = count()
+    lock = threading.Lock()
+
+    def worker():
+        while True:
+            with lock:
+                i = next(numbers)
+            if i >= len(requests):
+                return
+            request = requests[i]
+            start = time.perf_counter()
+            try:
+                status, size = target.request(
+                    request["method"], request["path"], request.get("params", {})
+                )
+            except Exception:
+                status, size = None, 0
+            seconds = time.perf_counter() - start
+            results[i] = (request["method"], request["path"], status, size, seconds)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        for future in [executor.submit(worker) for _ in range(concurrency)]:
+            future.result()
+    return results, time.perf_counter() - start
+
+
+def percentiles(seconds):
+    ms = sorted(s * 1000 for s in seconds)
+    if len(ms) == 1:
+        return {"p50": ms[0], "p95": ms[0], "p99": ms[0], "max": ms[0]}
+    cuts = statistics.quantiles(ms, n=100, method="inclusive")
+    return {"p50": cuts[49], "p95": cuts[94], "p99": cuts[98], "max": ms[-1]}
+
+
+def summarize(results, elapsed):
+    """Returns the statistics of each endpoint's results, and of them all"""
+    groups = {"all": results}
+    for result in results:
+        groups.setdefault("{} {}".format(result[0], result[1]), []).append(result)
+
+    summary = {}
+    for name, group in sorted(groups.items()):
+        errors = sum(1 for r in group if r[2] is None or r[2] >= 400)
+        summary[name] = {
+            "requests": len(group),
+            "errors": errors,
+            "error_rate": errors / len(group),
+            "throughput": len(group) / elapsed,
+            "mean_bytes": statistics.fmean(r[3] for r in group),
+            "latency_ms": percentiles([r[4] for r in group]),
+        }
+    return summary
+
+
+def print_summary(summary):
+    print(
+        "{:28} {:>8} {:>8} {:>9} {:>9} {:>9} {:>9}".format(
+            "endpoint", "requests", "errors", "req/s", "p50 ms", "p95 ms", "p99 ms"
+        )
+    )
+    for name, stats in summary.items():
+        latency = stats["latency_ms"]
+        print(
+            "{:28} {:>8} {:>8} {:>9.1f} {:>9.1f} {:>9.1f} {:>9.1f}".format(
+                name,
+                stats["requests"],
+                stats["errors"],
+                stats["throughput"],
+                latency["p50"],
+                latency["p95"],
+                latency["p99"],
+            )
+        )
+
+
+def load_requests(args, uri):
+    if args.log:
+        return read_log(args.log)
+    if args.access_log:
+        return read_access_log(args.access_log)
+    session = sessionmaker(bind=create_engine(uri))()
+    points, polygons = sample_overlaps(session)
+    session.close()
+    requests = generate_log(args.requests, points, polygons, args.seed)
+    if args.save_log:
+        with open(args.save_log, "w") as f:
+            for request in requests:
+                f.write(json.dumps(request) + "\n")
+    return requests
+
+
+def run(args):
+    # a server at --url has its own database; the requests only need one to
+    # be generated from
+    source = nullcontext(args.db) if args.url else database(args.db)
+    with source as uri:
+        if not args.db and not args.url:
+            engine = create_engine(uri)
+            create_schema(engine)
+            dataset = Dataset(vertices=args.vertices)
+            print("Generating data")
+            generate(sessionmaker(bind=engine)(), dataset, args.seed)
+            engine.dispose()
+
+        if args.url:
+            if not (args.db or args.log or args.access_log):
+                raise SystemExit("--url needs a request log, or --db to generate one")
+            target = HTTPTarget(args.url)
+        else:
+            os.environ["DB"] = uri
+            if args.no_response_cache:
+                os.environ["SCIP_RESPONSE_CACHE_BYTES"] = "0"
+            from scip import get_app
+
+            target = WSGITarget(get_app())
+
+        requests = load_requests(args, uri)
+        requests = list(islice(cycle(requests), args.requests))
+        if args.warmup:
+            replay(target, requests[: args.warmup], 1)
+        print(
+            "Replaying {} requests with concurrency {}".format(
+                len(requests), args.concurrency
+            )
+        )
+        results, elapsed = replay(target, requests, args.concurrency)
+
+    summary = summarize(results, elapsed)
+    print_summary(summary)
+    return {
+        "created": datetime.now(timezone.utc).isoformat(),
+        "commit": git_commit(),
+        "target": args.url or "wsgi",
+        "concurrency": args.concurrency,
+        "elapsed": elapsed,
+        "configuration": {
+            name: os.environ[name]
+            for name in CONFIGURATION
+            + [
+                "SCIP_RESPONSE_CACHE_BYTES",
+                "SQLALCHEMY_POOL_CLASS",
+                "SQLALCHEMY_POOL_SIZE",
+                "SQLALCHEMY_MAX_OVERFLOW",
+            ]
+            if name in os.environ
+        },
+        "endpoints": summary,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--log", help="a JSON lines file of requests to replay")
+    source.add_argument("--access-log", help="a web server access log to replay")
+    parser.add_argument("--save-log", help="write the generated requests here")
+    parser.add_argument("--url", help="send requests to the server at this URL")
+    parser.add_argument("--db", help="an existing, populated database URL")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument(
+        "--requests",
+        type=int,
+        default=2000,
+        help="the number of requests to send, repeating the log if necessary",
+    )
+    parser.add_argument(
+        "--warmup",
+        type=int,
+        default=0,
+        help="send this many requests first, unmeasured",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--vertices",
+        type=int,
+        default=Dataset().vertices,
+        help="vertices in each generated boundary",
+    )
+    parser.add_argument(
+        "--no-response-cache",
+        action="store_true",
+        help="disable the response cache of the app in this process",
+    )
+    parser.add_argument("--output", default="load-results.json")
+    args = parser.parse_args(argv)
+
+    report = run(args)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print("Wrote results to {}".format(args.output))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+Generates a synthetic salmon database, much larger than the test suite's
+sample data, for benchmarking.
+
+Regions and conservation units are star-shaped polygons with thousands of
+vertices and an irregular edge, laid out on grids across an area the size
+of BC in the database's BC Albers projection, so they overlap each other the
+way real watersheds, basins and conservation units do. Each conservation
+unit is home to several populations of different taxons.
+
+The generator is deterministic for a given seed, so results from different
+commits are measured against the same data.
+"""
+
+import math
+import random
+from collections import namedtuple
+from sqlalchemy import insert
+from sqlalchemy_sqlschema import maintain_schema
+from salmon_occurrence import Region, ConservationUnit, Population, Taxon
+
+DATABASE_SRID = 3005
+
+# an area of BC Albers covering most of the province
+EXTENT = (500000, 400000, 1800000, 1700000)
+
+TAXONS = [
+    ("Chinook", "Oncorhynchus tshawytscha", None),
+    ("Chum", "Oncorhynchus keta", None),
+    ("Coho", "Oncorhynchus kisutch", None),
+    ("Pink", "Oncorhynchus gorbuscha", "Odd"),
+    ("Pink", "Oncorhynchus gorbuscha", "Even"),
+    ("Sockeye", "Oncorhynchus nerka", "River"),
+    ("Sockeye", "Oncorhynchus nerka", "Lake"),
+]
+
+# the sizes of a generated dataset
+Dataset = namedtuple(
+    "Dataset",
+    ["watersheds", "basins", "conservation_units", "vertices", "populations_per_cu"],
+    defaults=[2000, 200, 1000, 2000, 3],
+)
+
+
+def grid_cells(count, extent=EXTENT):
+    """Returns the centres of count cells in a square grid covering extent,
+    and the cells' size"""
+    minx, miny, maxx, maxy = extent
+    side = math.ceil(math.sqrt(count))
+    size = max(maxx - minx, maxy - miny) / side
+    cells = [
+        (minx + (column + 0.5) * size, miny + (row + 0.5) * size)
+        for row in range(side)
+        for column in range(side)
+    ]
+    return cells[:count], size
+
+
+def star_polygon(rng, centre, radius, vertices):
+    """Returns the EWKT of a polygon with an irregular edge around centre,
+    within radius of it"""
+    x, y = centre
+    # a few low frequency lobes, plus noise for a rough edge
+    lobes = [(rng.randint(2, 7), rng.uniform(0, 2 * math.pi)) for _ in range(3)]
+    points = []
+    for i in range(vertices):
+        angle = 2 * math.pi * i / vertices
+        r = 0.75 + sum(0.05 * math.sin(k * angle + phase) for k, phase in lobes)
+        r = radius * (r + rng.uniform(-0.05, 0.05))
+        points.append((x + r * math.cos(angle), y + r * math.sin(angle)))
+    points.append(points[0])
+    return "SRID={};POLYGON(({}))".format(
+        DATABASE_SRID, ", ".join("{:.1f} {:.1f}".format(*p) for p in points)
+    )
+
+
+def point(x, y):
+    return "SRID={};POINT({:.1f} {:.1f})".format(DATABASE_SRID, x, y)
+
+
+def region_rows(rng, kind, count, vertices, prefix, offset=0.0):
+    cells, size = grid_cells(count)
+    rows = []
+    for i, (x, y) in enumerate(cells):
+        # offset grids so the regions of different kinds overlap unevenly
+        x, y = x + offset * size, y + offset * size
+        rows.append(
+            {
+                "kind": kind,
+                "name": "{} {}".format(kind.replace("_", " ").title(), i),
+                "code": "{}{:05d}".format(prefix, i),
+                "boundary": star_polygon(rng, (x, y), size * 0.6, vertices),
+                "outlet": point(x, y),
+            }
+        )
+    return rows
+
+
+def generate(session, dataset=Dataset(), seed=0):
+    """Adds a synthetic dataset of the given size to the database and
+    commits it. Returns the number of rows added to each table."""
+    rng = random.Random(seed)
+    watersheds = region_rows(
+        rng, "watershed", dataset.watersheds, dataset.vertices, "W"
+    )
+    basins = region_rows(rng, "basin", dataset.basins, dataset.vertices, "B", 0.25)
+    cus = region_rows(
+        rng,
+        "conservation_unit",
+        dataset.conservation_units,
+        dataset.vertices,
+        "C",
+        0.4,
+    )
+    for cu in cus:
+        del cu["kind"]
+
+    with maintain_schema("salmon_geometry, public", session):
+        session.execute(insert(Region), watersheds + basins)
+        session.execute(
+            insert(Taxon),
+            [
+                {"common_name": c, "scientific_name": s, "subgroup": g}
+                for c, s, g in TAXONS
+            ],
+        )
+        session.execute(insert(ConservationUnit), cus)
+        session.flush()
+
+        taxon_ids = [id for (id,) in session.query(Taxon.id).order_by(Taxon.id)]
+        cu_ids = [
+            id
+            for (id,) in session.query(ConservationUnit.id).order_by(
+                ConservationUnit.id
+            )
+        ]
+        per_cu = min(dataset.populations_per_cu, len(taxon_ids))
+        populations = [
+            {"taxon_id": taxon_id, "conservation_unit_id": cu_id, "overwinter": False}
+            for cu_id in cu_ids
+            for taxon_id in rng.sample(taxon_ids, per_cu)
+        ]
+        session.execute(insert(Population), populations)
+    session.commit()
+
+    return {
+        "region": len(watersheds) + len(basins),
+        "conservation_unit": len(cus),
+        "taxon": len(taxon_ids),
+        "population": len(populations),
+    }
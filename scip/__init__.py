@@ -4,24 +4,50 @@ from typing import Any, Dict
 from flask import Flask
 from flask_cors import CORS
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.engine import make_url
 from sqlalchemy.pool import NullPool
 
 from scip.routes import add_routes
+from scip.commands import add_commands
+from scip.api.slow_queries import enable_slow_query_log
 
 db = SQLAlchemy()
 
 
-def _build_engine_options() -> Dict[str, Any]:
+def _build_engine_options(url: str = "") -> Dict[str, Any]:
     """Build SQLAlchemy engine options from environment variables.
 
     Set SQLALCHEMY_POOL_CLASS=null to use NullPool (recommended when deploying
     behind pgbouncer). Optional pool tuning via SQLALCHEMY_POOL_SIZE,
     SQLALCHEMY_MAX_OVERFLOW, SQLALCHEMY_POOL_TIMEOUT, SQLALCHEMY_POOL_RECYCLE.
+
+    SQLALCHEMY_QUERY_CACHE_SIZE sets the number of compiled statements kept
+    in the engine's cache (SQLAlchemy's default is 500). With the psycopg 3
+    driver (a postgresql+psycopg:// URL), SQLALCHEMY_PREPARE_THRESHOLD sets
+    how many times a statement is executed on a connection before it is
+    prepared on the server; psycopg2 can't prepare statements. Don't enable
+    it behind a pgbouncer that doesn't track prepared statements.
     """
+    options: Dict[str, Any] = {}
+
+    cache_size = os.getenv("SQLALCHEMY_QUERY_CACHE_SIZE")
+    if cache_size is not None:
+        options["query_cache_size"] = int(cache_size)
+
+    prepare_threshold = os.getenv("SQLALCHEMY_PREPARE_THRESHOLD")
+    if prepare_threshold is not None:
+        if make_url(url).get_driver_name() != "psycopg":
+            raise ValueError(
+                "SQLALCHEMY_PREPARE_THRESHOLD requires the psycopg driver "
+                "(a postgresql+psycopg:// database URL)"
+            )
+        options["connect_args"] = {"prepare_threshold": int(prepare_threshold)}
+
     if os.getenv("SQLALCHEMY_POOL_CLASS", "").lower() == "null":
-        return {"poolclass": NullPool}
+        options["poolclass"] = NullPool
+        return options
 
-    options: Dict[str, Any] = {"pool_pre_ping": True}
+    options["pool_pre_ping"] = True
 
     for env_var, key, cast in [
         ("SQLALCHEMY_POOL_SIZE", "pool_size", int),
@@ -44,9 +70,14 @@ def get_app():
         "DB", "postgresql://scip_ro@db.pcic.uvic.ca/scip"
     )
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False  # Default is already false.
-    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = _build_engine_options()
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = _build_engine_options(
+        app.config["SQLALCHEMY_DATABASE_URI"]
+    )
 
     db.init_app(app)
+    with app.app_context():
+        enable_slow_query_log(db.engine)
 
     add_routes(app, db)
+    add_commands(app, db)
     return app
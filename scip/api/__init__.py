@@ -1,63 +1,105 @@
 import inspect
 from json import dumps
 from werkzeug.wrappers import Response
-from flask import request
+from flask import request, stream_with_context
 
 from scip.api.region import region
 from scip.api.population import population
 from scip.api.taxon import taxon
+from scip.api.results import json_array, RawJSON
+from scip.api import serializer
+from scip.api.snapshot import snapshot_entry, snapshot_response
+from scip.api.compression import LazyEncodings, compress, encoded_response
+from scip.api.materialized_views import without_dropped_views
+from scip.api.response_cache import (
+    CachedResponse,
+    cache_key,
+    etag,
+    response_cache,
+)
+from scip.api.statement_cache import cache_geometry_types
+from scip.api.timing import phase
+
+cache_geometry_types()
 
 methods = {"region": region, "population": population, "taxon": taxon}
 
 __all__ = list(methods.keys()) + ["call"]
 
 
-def call(session, request_type):
-    # this function is mostly copied from PCEX
+class RequestError(Exception):
+    """A request for an endpoint that doesn't exist"""
+
+
+def error_response(error):
+    """Returns a 400 response describing a RequestError or ParameterError"""
+    body = {"error": str(error), "parameter": getattr(error, "parameter", None)}
+    return Response(dumps(body), status=400, content_type="application/json")
+
+
+def request_args(request_type, params):
+    """Returns the endpoint function for request_type and its parameters,
+    taken from the mapping params. Raises RequestError if the endpoint
+    doesn't exist."""
     try:
         func = methods[request_type]
     except KeyError:
-        return Response("Endpoint {} not recognized".format(request_type), status=400)
-
-    # check for required arguments - using request.values checkes
-    # both parameters in URL strings and parameters in JSON-style request
-    # bodies.
-    required_params = set(get_required_args(func)).difference(["session"])
+        raise RequestError("Endpoint {} not recognized".format(request_type))
+    return func, func.schema.select(params)
 
-    provided_params = set(request.values.keys())
-    optional_params = set(get_keyword_args(func))
 
-    missing_params = required_params.difference(provided_params)
-    if missing_params:
-        return Response(
-            "Missing query parameters: {}".format(missing_params), status=400
-        )
+def response_body(rv):
+    """Returns the JSON encoded body of an endpoint's result"""
+    if isinstance(rv, RawJSON):
+        return rv.encode()
+    return serializer.dumps(rv)
 
-    args = {key: request.values.get(key) for key in required_params}
-    kwargs = {
-        key: request.values.get(key)
-        for key in optional_params
-        if request.values.get(key) is not None
-    }
 
-    args.update(kwargs)
+def cached_response(session, request_type, func, args):
+    """Returns the CachedResponse for a request, running its query if it
+    isn't already cached, or a generator if the request is streamed."""
+    key = cache_key(request_type, args)
+    cached = response_cache.get(key)
+    if cached is None:
+        rv = without_dropped_views(session, func, **args)
+        if inspect.isgenerator(rv):
+            return rv
+        with phase("serialize"):
+            body = response_body(rv)
+        if not response_cache.fits(len(body)):
+            # compressing it well isn't worth it if it won't be kept
+            return CachedResponse(body, etag(body), LazyEncodings(body))
+        with phase("compress"):
+            encodings = compress(body)
+        cached = CachedResponse(body, etag(body), encodings)
+        response_cache.put(key, cached)
+    return cached
 
-    rv = func(session, **args)
-    resp = Response(dumps(rv), content_type="application/json")
-    return resp
 
+def call(session, request_type):
+    # this function is mostly copied from PCEX
+    # using request.values checks both parameters in URL strings and
+    # parameters in JSON-style request bodies.
+    try:
+        with phase("parse"):
+            func, args = request_args(request_type, request.values)
+        entry = snapshot_entry(request_type, args)
+        if entry:
+            with phase("snapshot"):
+                return snapshot_response(entry, request)
+        cached = cached_response(session, request_type, func, args)
+    except (RequestError, ValueError) as e:
+        return error_response(e)
 
-# from http://stackoverflow.com/q/196960/
-def get_required_args(func):
-    args, _, _, defaults, _, _, _ = inspect.getfullargspec(func)
-    if defaults:
-        args = args[: -len(defaults)]
-    return args  # *args and **kwargs are not required, so ignore them.
-
+    if inspect.isgenerator(cached):
+        # a streaming response, written out as it is fetched from the
+        # database, and not cached.
+        return Response(
+            stream_with_context(json_array(cached)), content_type="application/json"
+        )
 
-def get_keyword_args(func):
-    args, _, _, defaults, _, _, _ = inspect.getfullargspec(func)
-    if defaults:
-        return args[-len(defaults) :]
-    else:
-        return []
+    # the response is sent in the compressed encoding the client prefers.
+    # A client that already has this response (it sent a matching
+    # If-None-Match header) receives a 304 Not Modified instead.
+    resp = Response(content_type="application/json")
+    return encoded_response(resp, request, cached.body, cached.etag, cached.encodings)
@@ -0,0 +1,93 @@
+"""
+The front end typically requests taxons, several kinds of region, and
+populations together when a page loads. The batch endpoint answers a list of
+such requests in a single HTTP call, to save round trips over slow
+connections.
+
+The request body is a JSON list of objects, each with a `request_type` (the
+name of an endpoint, such as `region`) and a `params` object holding the
+parameters that would have been passed to that endpoint. The response is a
+list with one object per request, in the same order, each with the `status`
+the request would have had on its own, and either its `result` or an `error`
+message, and the `parameter` at fault if there is one.
+
+Each request is answered from, and stored in, the same response cache as the
+individual endpoints, and requests are run concurrently (see concurrent.py).
+Results can't be streamed within a batch.
+"""
+
+import os
+from functools import partial
+from json import dumps
+from scip.api import RequestError, request_args, cached_response
+from scip.api.concurrent import run_concurrently
+
+# the largest number of requests accepted in one batch
+MAX_BATCH_SIZE = int(os.getenv("SCIP_BATCH_MAX_REQUESTS", 20))
+
+
+def batch_param(value):
+    # parameters are converted to the strings that would have been sent in
+    # a URL, so they are validated and cached the same way.
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, list):
+        return ",".join(str(v) for v in value)
+    if isinstance(value, dict):
+        # a geoJSON geometry
+        return dumps(value)
+    return str(value)
+
+
+def parse_batch(items):
+    if not isinstance(items, list):
+        raise RequestError("A batch must be a list of requests")
+    if len(items) > MAX_BATCH_SIZE:
+        raise RequestError(
+            "A batch may contain at most {} requests".format(MAX_BATCH_SIZE)
+        )
+    for item in items:
+        if (
+            not isinstance(item, dict)
+            or not isinstance(item.get("request_type"), str)
+            or not isinstance(item.get("params", {}), dict)
+        ):
+            raise RequestError(
+                "Each request must be an object with a request_type and params"
+            )
+    return items
+
+
+def batch_item(session, item):
+    """Returns the JSON text of the response to one request of a batch"""
+    request_type = item.get("request_type")
+    params = {
+        key: batch_param(value)
+        for key, value in item.get("params", {}).items()
+        if value is not None and key != "stream"
+    }
+    try:
+        func, args = request_args(request_type, params)
+        cached = cached_response(session, request_type, func, args)
+    except (RequestError, ValueError) as e:
+        error = {"status": 400, "error": str(e)}
+        error["parameter"] = getattr(e, "parameter", None)
+        return dumps(error)
+    # the cached body is already JSON, and is included without re-parsing it
+    return '{{"status": 200, "result": {}}}'.format(cached.body.decode())
+
+
+def batch(session, items):
+    """Answers a list of API requests.
+
+    :param session: (sqlalchemy.orm.session.Session) a database Session object
+    :param items: a list of dictionaries, each with a `request_type` and `params`
+
+    :return: the JSON text of a list of responses, one for each request
+    """
+    items = parse_batch(items)
+    # requests not already cached are run concurrently
+    responses = run_concurrently(
+        session, [partial(batch_item, item=item) for item in items]
+    )
+    return "[{}]".format(", ".join(responses))
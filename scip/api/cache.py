@@ -0,0 +1,132 @@
+"""
+In-process caches for information that only changes when new data is
+loaded into the SCIP database.
+
+A BindCache remembers the result of a loader function separately for each
+database the API is connected to, and reloads it after SCIP_CACHE_TTL seconds
+(default one hour). Running servers discard every cached value shortly after
+new data is loaded (see data_version.py); invalidate_all() discards them
+immediately, in the process that calls it.
+
+An LRUCache holds a bounded amount of data, such as API responses, keyed on
+anything hashable.
+"""
+
+import os
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+_registry = []
+
+
+def cache_ttl():
+    """Number of seconds cached database information is trusted for"""
+    return float(os.getenv("SCIP_CACHE_TTL", 3600))
+
+
+class BindCache:
+    """Caches the value returned by loader(session), keyed on the session's
+    database bind, for ttl seconds.
+
+    Only one thread loads a value at a time. While an expired value is being
+    reloaded, other threads are given the expired value rather than loading
+    it too; if there is no value yet, they wait for it."""
+
+    def __init__(self, loader, ttl=None):
+        self.loader = loader
+        self.ttl = cache_ttl() if ttl is None else ttl
+        self._values = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+        self._loading = threading.Lock()
+        _registry.append(self)
+
+    def get(self, session):
+        bind = session.get_bind()
+        with self._lock:
+            entry = self._values.get(bind)
+        if entry is not None and time.monotonic() - entry[0] < self.ttl:
+            return entry[1]
+
+        if not self._loading.acquire(blocking=entry is None):
+            return entry[1]
+        try:
+            # another thread may have loaded it while this one waited
+            with self._lock:
+                latest = self._values.get(bind)
+            if latest is not None and latest is not entry:
+                return latest[1]
+            now = time.monotonic()
+            value = self.loader(session)
+            with self._lock:
+                self._values[bind] = (now, value)
+            return value
+        finally:
+            self._loading.release()
+
+    def invalidate(self):
+        with self._lock:
+            self._values.clear()
+
+
+def invalidate_all():
+    """Discard every cached value; they will be reloaded from the database
+    the next time they are needed."""
+    for cache in _registry:
+        cache.invalidate()
+
+
+class LRUCache:
+    """A size-bounded cache. Holds values totalling at most max_size, as
+    measured by the sizeof function, discarding the least recently used
+    values first. Values also expire after ttl seconds."""
+
+    def __init__(self, max_size, sizeof=len, ttl=None):
+        self.max_size = max_size
+        self.sizeof = sizeof
+        self.ttl = cache_ttl() if ttl is None else ttl
+        self.size = 0
+        self._values = OrderedDict()
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def get(self, key):
+        """Returns the value cached for key, or None"""
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                return None
+            if time.monotonic() - entry[0] >= self.ttl:
+                self._discard(key)
+                return None
+            self._values.move_to_end(key)
+            return entry[1]
+
+    def fits(self, size):
+        """Whether a value of this size can be cached"""
+        return size <= self.max_size
+
+    def put(self, key, value):
+        size = self.sizeof(value)
+        if size > self.max_size:
+            return
+        with self._lock:
+            if key in self._values:
+                self._discard(key)
+            self._values[key] = (time.monotonic(), value, size)
+            self.size += size
+            while self.size > self.max_size:
+                self._discard(next(iter(self._values)))
+
+    def _discard(self, key):
+        _, _, size = self._values.pop(key)
+        self.size -= size
+
+    def __len__(self):
+        return len(self._values)
+
+    def invalidate(self):
+        with self._lock:
+            self._values.clear()
+            self.size = 0
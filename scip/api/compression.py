@@ -0,0 +1,114 @@
+"""
+Responses with geoJSON boundaries are large, and compress five to ten
+times. Cached responses are compressed once, when they are cached, and the
+compressed variants are kept alongside the uncompressed body, so each
+client can be sent the encoding it accepts without compressing anything
+per request.
+
+Responses that won't be cached, because they are too large or the response
+cache is disabled, are instead compressed as they are sent, only in the
+encoding the client prefers, with faster settings (see LazyEncodings).
+
+Responses are compressed with brotli, if the optional brotli package is
+installed, and gzip. Responses smaller than SCIP_COMPRESSION_MIN_SIZE bytes
+(default 1024) aren't worth compressing, and are always sent uncompressed.
+"""
+
+import gzip
+import os
+from collections.abc import Mapping
+from scip.api.timing import phase
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+MIN_SIZE = int(os.getenv("SCIP_COMPRESSION_MIN_SIZE", 1024))
+
+# content encodings, most preferred first
+encoders = {}
+if brotli:
+    encoders["br"] = lambda body: brotli.compress(body, quality=8)
+encoders["gzip"] = lambda body: gzip.compress(body, compresslevel=9, mtime=0)
+
+# the same encodings, faster, for responses compressed each time they're sent
+fast_encoders = {}
+if brotli:
+    fast_encoders["br"] = lambda body: brotli.compress(body, quality=4)
+fast_encoders["gzip"] = lambda body: gzip.compress(body, compresslevel=5, mtime=0)
+
+
+def compress(body):
+    """Returns a dictionary of the compressed variants of a response body,
+    keyed on content encoding, or an empty one if it isn't worth
+    compressing"""
+    if len(body) < MIN_SIZE:
+        return {}
+    return {encoding: encode(body) for encoding, encode in encoders.items()}
+
+
+class LazyEncodings(Mapping):
+    """The compressed variants of a response body that won't be cached,
+    like the dictionary returned by compress(), but compressed with the fast
+    encoders only when a variant is used"""
+
+    # fast variants differ from the cached ones, so have their own entity tags
+    tag = "fast"
+
+    def __init__(self, body):
+        self.body = body
+        self.available = list(fast_encoders) if len(body) >= MIN_SIZE else []
+        self.variants = {}
+
+    def __getitem__(self, encoding):
+        if encoding not in self.available:
+            raise KeyError(encoding)
+        if encoding not in self.variants:
+            with phase("compress"):
+                self.variants[encoding] = fast_encoders[encoding](self.body)
+        return self.variants[encoding]
+
+    def __contains__(self, encoding):
+        return encoding in self.available
+
+    def __iter__(self):
+        return iter(self.available)
+
+    def __len__(self):
+        return len(self.available)
+
+
+def negotiate(request, encodings):
+    """Returns the content encoding, from encodings, that the client accepts
+    and prefers, or None to send the response uncompressed"""
+    if not encodings:
+        return None
+    return request.accept_encodings.best_match(list(encodings))
+
+
+def encoded_etag(etag, encoding, encodings=None):
+    """Each encoding of a response is a different representation, so has
+    its own strong entity tag"""
+    if encoding is None:
+        return etag
+    tag = getattr(encodings, "tag", None)
+    if tag:
+        return "{}-{}-{}".format(etag, encoding, tag)
+    return "{}-{}".format(etag, encoding)
+
+
+def encoded_response(resp, request, body, etag, encodings):
+    """Sets the body of a Response to the variant of a response body the
+    client prefers, from body and its compressed encodings, and makes the
+    response conditional on its entity tag"""
+    encoding = negotiate(request, encodings)
+    if encoding:
+        resp.set_data(encodings[encoding])
+        resp.content_encoding = encoding
+    else:
+        resp.set_data(body)
+    if encodings:
+        resp.vary.add("Accept-Encoding")
+    resp.set_etag(encoded_etag(etag, encoding, encodings))
+    return resp.make_conditional(request)
@@ -0,0 +1,68 @@
+"""
+Some requests, such as batches, run several independent queries. Rather than
+running them one after the other on the request's session, they can be run
+at the same time, each on its own session and pooled database connection,
+so the request takes about as long as its slowest query instead of the sum
+of all of them.
+
+At most SCIP_QUERY_PARALLELISM (default 4) queries from one request run at
+once, further limited by the number of connections the engine's pool can
+provide, and at most SCIP_QUERY_THREADS (default 16) across all requests.
+Setting SCIP_QUERY_PARALLELISM to 1 runs every query on the request's own
+session, as before.
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import QueuePool
+
+_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("SCIP_QUERY_THREADS", 16)),
+    thread_name_prefix="scip-query",
+)
+
+
+def parallelism(engine):
+    """Returns the largest number of queries one request may run at once"""
+    limit = int(os.getenv("SCIP_QUERY_PARALLELISM", 4))
+    pool = engine.pool
+    if isinstance(pool, QueuePool) and pool._max_overflow >= 0:
+        # leave a connection for the request's own session
+        limit = min(limit, pool.size() + pool._max_overflow - 1)
+    return max(limit, 1)
+
+
+def run_concurrently(session, tasks):
+    """Runs each task, a function taking a session, and returns a list of
+    their results in order. Tasks run on separate sessions bound to the same
+    database as session, so they must not depend on each other or on
+    anything not yet committed in session. If a task raises an exception,
+    it is raised here once the running tasks have finished."""
+    tasks = list(tasks)
+    bind = session.get_bind()
+    limit = min(parallelism(bind), len(tasks))
+    if limit <= 1:
+        return [task(session) for task in tasks]
+
+    results = [None] * len(tasks)
+    pending = iter(enumerate(tasks))
+    lock = threading.Lock()
+
+    # each worker has its own session, and takes tasks until none are left
+    def worker():
+        with Session(bind=bind) as worker_session:
+            while True:
+                with lock:
+                    i, task = next(pending, (None, None))
+                if task is None:
+                    return
+                results[i] = task(worker_session)
+                worker_session.rollback()
+
+    workers = [_executor.submit(worker) for _ in range(limit)]
+    wait(workers)
+    for future in workers:
+        future.result()
+    return results
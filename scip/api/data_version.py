@@ -0,0 +1,69 @@
+"""
+Running servers notice that new data has been loaded, or precomputed data
+rebuilt, by polling a cheap fingerprint of the database's contents: how
+many tables and materialized views the salmon schemas hold, and how many
+rows PostgreSQL's statistics have counted being inserted, updated and
+deleted in them. When it changes, every cache in the process is discarded
+(see cache.invalidate_all()).
+
+Each worker process checks at most every SCIP_DATA_VERSION_INTERVAL seconds
+(default 10), at the start of a request, so every worker discards its
+caches shortly after a data load. PostgreSQL updates its statistics within
+a few seconds of each transaction, and also counts rows changed by
+transactions that were rolled back, which only causes an unneeded
+invalidation.
+"""
+
+import os
+import threading
+import time
+import weakref
+from sqlalchemy import text
+from scip.api.cache import invalidate_all
+
+VERSION_QUERY = text(
+    "SELECT count(*), coalesce(sum(n_tup_ins + n_tup_upd + n_tup_del), 0) "
+    "FROM pg_stat_user_tables WHERE schemaname IN ('public', 'salmon_geometry')"
+)
+
+
+def data_version_interval():
+    """Number of seconds between checks of the database's data version"""
+    return float(os.getenv("SCIP_DATA_VERSION_INTERVAL", 10))
+
+
+class DataVersion:
+    """Remembers the data version of each database the API is connected to,
+    checking it again at most every interval seconds."""
+
+    def __init__(self, interval=None):
+        self.interval = data_version_interval() if interval is None else interval
+        self._versions = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def changed(self, session):
+        """Whether the data in the session's database has changed since it
+        was last checked. It isn't checked again within interval seconds."""
+        bind = session.get_bind()
+        now = time.monotonic()
+        with self._lock:
+            checked, version = self._versions.get(bind, (None, None))
+            if checked is not None and now - checked < self.interval:
+                return False
+            # concurrent requests don't also check while this one does
+            self._versions[bind] = (now, version)
+
+        current = tuple(session.execute(VERSION_QUERY).one())
+        with self._lock:
+            self._versions[bind] = (now, current)
+        return version is not None and current != version
+
+
+_data_version = DataVersion()
+
+
+def check_data_version(session):
+    """Discards every cached value if the data in the session's database
+    has changed since it was last checked"""
+    if _data_version.changed(session):
+        invalidate_all()
@@ -0,0 +1,231 @@
+"""
+Region and conservation unit geometries are stored in the database in the
+BC Albers projection, but returned to the front end as geoJSON in EPSG 4326.
+Since the geometries only change when new data is loaded, the transformed
+and serialized geometries can be precomputed into materialized views by
+running `flask precompute` after loading data.
+
+When the materialized views are present, queries read the precomputed
+geoJSON from them instead of reprojecting every boundary on every request.
+Rows added after the views were last refreshed fall back to being
+reprojected at query time. When the views are not present, all geometries
+are reprojected at query time, as before.
+
+Boundaries may also be requested simplified for display at a particular web
+map zoom level. Each zoom level is served by one of a few fixed simplification
+tolerances, which are also precomputed into materialized views.
+"""
+
+from salmon_occurrence import Region, ConservationUnit
+from geoalchemy2 import Geometry
+from sqlalchemy import MetaData, Table, Column, Integer, Text
+from sqlalchemy import and_, func, literal, select, type_coerce, union_all
+from sqlalchemy.types import NullType
+from scip.api.materialized_views import (
+    existing_views,
+    invalidate_view_status,
+    refresh_materialized_view,
+    drop_materialized_view,
+    view_status,
+)
+from scip.api.projection import to_4326
+
+metadata = MetaData()
+
+
+def _store_table(name):
+    return Table(
+        name,
+        metadata,
+        Column("id", Integer, primary_key=True),
+        Column("boundary", Geometry(srid=4326)),
+        Column("outlet", Geometry(srid=4326)),
+        Column("boundary_geojson", Text),
+        Column("outlet_geojson", Text),
+    )
+
+
+def _simplified_table(name):
+    return Table(
+        name,
+        metadata,
+        Column("id", Integer, primary_key=True),
+        Column("tolerance", Integer, primary_key=True),
+        Column("boundary_geojson", Text),
+    )
+
+
+region_geometry = _store_table("region_geometry_4326")
+cu_geometry = _store_table("conservation_unit_geometry_4326")
+region_simplified = _simplified_table("region_simplified_4326")
+cu_simplified = _simplified_table("conservation_unit_simplified_4326")
+
+stores = {Region: region_geometry, ConservationUnit: cu_geometry}
+simplified_stores = {Region: region_simplified, ConservationUnit: cu_simplified}
+
+# Simplification tolerances, in metres (BC Albers units), paired with the
+# highest web map zoom level each is used for. A tolerance of roughly half
+# a screen pixel at that zoom level leaves no visible difference on the map.
+# Boundaries requested at higher zoom levels are not simplified.
+SIMPLIFICATION_LEVELS = [(5, 1500), (8, 200), (11, 25)]
+
+
+def simplification_tolerance(zoom):
+    """Returns the simplification tolerance for boundaries displayed at a
+    zoom level, or None if they should be displayed at full resolution."""
+    if zoom is None:
+        return None
+    for max_zoom, tolerance in SIMPLIFICATION_LEVELS:
+        if zoom <= max_zoom:
+            return tolerance
+    return None
+
+
+def as_geojson(geom, precision=None):
+    """geoJSON for a geometry, with coordinates rounded to a number of decimal
+    places if precision is given"""
+    if precision is None:
+        return func.ST_AsGeoJSON(geom)
+    return func.ST_AsGeoJSON(geom, precision)
+
+
+def simplified_geojson(boundary, tolerance, precision=None):
+    """geoJSON in EPSG 4326 of a boundary simplified without allowing it to
+    become invalid (self-intersecting or with collapsed rings)"""
+    return as_geojson(
+        to_4326(func.ST_SimplifyPreserveTopology(boundary, tolerance)), precision
+    )
+
+
+def store_definition(model):
+    """Returns the query a materialized view of precomputed geometries
+    for a table is built from"""
+    # the geometry columns are type coerced so SQLAlchemy doesn't wrap them
+    # in ST_AsEWKB, which would store them as binary instead of geometries.
+    return select(
+        model.id.label("id"),
+        type_coerce(to_4326(model.boundary), NullType).label("boundary"),
+        type_coerce(to_4326(model.outlet), NullType).label("outlet"),
+        func.ST_AsGeoJSON(to_4326(model.boundary)).label("boundary_geojson"),
+        func.ST_AsGeoJSON(to_4326(model.outlet)).label("outlet_geojson"),
+    )
+
+
+def simplified_definition(model):
+    """Returns the query a materialized view of precomputed simplified
+    boundaries for a table is built from, with one row for each
+    simplification tolerance."""
+    return union_all(
+        *[
+            select(
+                model.id.label("id"),
+                literal(tolerance).label("tolerance"),
+                simplified_geojson(model.boundary, tolerance).label("boundary_geojson"),
+            )
+            for _, tolerance in SIMPLIFICATION_LEVELS
+        ]
+    )
+
+
+def refresh_geometry_store(session):
+    """Creates or refreshes the precomputed EPSG 4326 geometry views"""
+    for model, table in stores.items():
+        refresh_materialized_view(session, table.name, store_definition(model), ["id"])
+    for model, table in simplified_stores.items():
+        refresh_materialized_view(
+            session, table.name, simplified_definition(model), ["id", "tolerance"]
+        )
+    invalidate_view_status()
+
+
+def _store_tables():
+    return list(stores.values()) + list(simplified_stores.values())
+
+
+def drop_geometry_store(session):
+    for table in _store_tables():
+        drop_materialized_view(session, table.name)
+    invalidate_view_status()
+
+
+def _load_store_status(session):
+    names = [table.name for table in _store_tables()]
+    return existing_views(session, names) == set(names)
+
+
+_store_status = view_status(_load_store_status)
+
+
+def geometry_store_available(session):
+    return _store_status.get(session)
+
+
+class LiveGeometry:
+    """geoJSON for a table's geometries, reprojected at query time"""
+
+    def __init__(self, model, tolerance=None, precision=None):
+        if tolerance:
+            self.boundary = simplified_geojson(model.boundary, tolerance, precision)
+        else:
+            self.boundary = as_geojson(to_4326(model.boundary), precision)
+        self.outlet = as_geojson(to_4326(model.outlet), precision)
+
+    def join(self, q):
+        return q
+
+
+class StoredGeometry:
+    """geoJSON for a table's geometries, read from the materialized views"""
+
+    def __init__(self, model, tolerance=None, precision=None):
+        live = LiveGeometry(model, tolerance)
+        self.model = model
+        self.tolerance = tolerance
+        self.table = stores[model]
+        self.simplified = simplified_stores[model]
+        if tolerance:
+            boundary = func.coalesce(self.simplified.c.boundary_geojson, live.boundary)
+            if precision is not None:
+                # the simplified geometries are only stored as geoJSON
+                boundary = as_geojson(func.ST_GeomFromGeoJSON(boundary), precision)
+        elif precision is not None:
+            boundary = as_geojson(
+                func.coalesce(self.table.c.boundary, to_4326(model.boundary)),
+                precision,
+            )
+        else:
+            boundary = func.coalesce(self.table.c.boundary_geojson, live.boundary)
+        self.boundary = boundary
+
+        if precision is not None:
+            self.outlet = as_geojson(
+                func.coalesce(self.table.c.outlet, to_4326(model.outlet)), precision
+            )
+        else:
+            self.outlet = func.coalesce(self.table.c.outlet_geojson, live.outlet)
+
+    def join(self, q):
+        q = q.outerjoin(self.table, self.table.c.id == self.model.id)
+        if self.tolerance:
+            q = q.outerjoin(
+                self.simplified,
+                and_(
+                    self.simplified.c.id == self.model.id,
+                    self.simplified.c.tolerance == self.tolerance,
+                ),
+            )
+        return q
+
+
+def geojson_4326(session, model, zoom=None, precision=None):
+    """Returns an object with `boundary` and `outlet` column expressions
+    giving geoJSON for the geometries of the Region or ConservationUnit model
+    in EPSG 4326, and a `join` method that must be applied to any query
+    using those expressions. If a zoom level is given, the boundary is
+    simplified for display at that zoom level. If a precision is given,
+    coordinates are rounded to that many decimal places."""
+    tolerance = simplification_tolerance(zoom)
+    if geometry_store_available(session):
+        return StoredGeometry(model, tolerance, precision)
+    else:
+        return LiveGeometry(model, tolerance, precision)
@@ -0,0 +1,81 @@
+"""
+Geometries received from the front end, such as the `overlap` parameter,
+may be WKT, geoJSON, or WKB (as bytes or a hex string), in EPSG 4326. They
+can be very large - polygons with thousands of vertices are the reason
+parameters can be POSTed - so each is parsed and validated once, and sent to
+PostGIS as EWKB, which it reads without parsing any text.
+
+Parsed geometries are cached by a hash of their text, so repeated requests
+for the same area aren't parsed again. The cache holds at most
+SCIP_GEOMETRY_CACHE_BYTES (default 16 MiB) of geometries.
+"""
+
+import hashlib
+import os
+import string
+from collections import namedtuple
+import shapely
+from shapely.errors import ShapelyError
+from sqlalchemy import LargeBinary, func, literal
+from scip.api.cache import LRUCache
+
+# shape: the shapely geometry
+# ewkb: the geometry as EWKB, with its SRID set to 4326
+# normalized: WKT of the geometry with its vertices in a canonical order, so
+#   equivalent geometries can be recognized
+InputGeometry = namedtuple("InputGeometry", ["shape", "ewkb", "normalized"])
+
+_geometry_cache = LRUCache(
+    int(os.getenv("SCIP_GEOMETRY_CACHE_BYTES", 16 * 1024 * 1024)),
+    sizeof=lambda g: 2 * len(g.ewkb) + len(g.normalized),
+)
+
+_hex_digits = set(string.hexdigits)
+
+
+def _load(value):
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return shapely.from_wkb(bytes(value))
+    text = value.strip()
+    if text.startswith("{"):
+        return shapely.from_geojson(text)
+    if text and set(text) <= _hex_digits:
+        return shapely.from_wkb(text)
+    return shapely.from_wkt(text)
+
+
+def parse_geometry(value):
+    """Returns the InputGeometry for a WKT, geoJSON or WKB geometry in
+    EPSG 4326, raising ValueError if it can't be parsed or is empty.
+    Already parsed InputGeometries are returned unchanged."""
+    if isinstance(value, InputGeometry):
+        return value
+    content = value.encode() if isinstance(value, str) else bytes(value)
+    key = hashlib.sha256(content).digest()
+    geometry = _geometry_cache.get(key)
+    if geometry is not None:
+        return geometry
+
+    try:
+        shape = _load(value)
+    except (ShapelyError, ValueError, TypeError):
+        raise ValueError("Could not parse geometry: {:.100}".format(str(value)))
+    if shape is None or shape.is_empty:
+        raise ValueError("Geometry is empty: {:.100}".format(str(value)))
+    if shapely.get_srid(shape) not in (0, 4326):
+        raise ValueError("Geometry must be in EPSG 4326")
+
+    geometry = InputGeometry(
+        shape,
+        shapely.to_wkb(shapely.set_srid(shape, 4326), include_srid=True),
+        shapely.normalize(shape).wkt,
+    )
+    _geometry_cache.put(key, geometry)
+    return geometry
+
+
+def bind_geometry(value):
+    """Returns a SQL expression for a geometry received from the front end,
+    as a bound EWKB parameter"""
+    ewkb = parse_geometry(value).ewkb
+    return func.ST_GeomFromEWKB(literal(ewkb, LargeBinary))
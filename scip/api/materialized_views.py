@@ -0,0 +1,122 @@
+"""
+Helper functions for managing the materialized views that hold data
+precomputed by `flask precompute`.
+
+The views are owned by the user that runs `flask precompute`, which is not
+usually the user the service connects as. If SCIP_READER_ROLE is set, SELECT
+on each view is granted to that role whenever the view is refreshed. Views
+the service's user can't read are treated as absent.
+
+The views can be created or dropped while the service is running, by
+another process, so whether they are present is rechecked every
+SCIP_PRECOMPUTED_CHECK_TTL seconds (default one minute), and immediately if a
+query finds one missing (see without_dropped_views()).
+"""
+
+import os
+from sqlalchemy import func, select
+from sqlalchemy.exc import ProgrammingError
+from sqlalchemy_sqlschema import maintain_schema
+from scip.api.cache import BindCache
+
+# SQLSTATE of an error referring to a table or view that doesn't exist
+UNDEFINED_TABLE = "42P01"
+
+_status_caches = []
+
+
+def precomputed_check_ttl():
+    """Number of seconds the presence of the views is trusted for"""
+    return float(os.getenv("SCIP_PRECOMPUTED_CHECK_TTL", 60))
+
+
+def view_status(loader):
+    """Returns a BindCache of loader(session), which says whether some
+    views are present, that is rechecked every SCIP_PRECOMPUTED_CHECK_TTL
+    seconds"""
+    cache = BindCache(loader, ttl=precomputed_check_ttl())
+    _status_caches.append(cache)
+    return cache
+
+
+def invalidate_view_status():
+    """Discards this process's record of which views are present"""
+    for cache in _status_caches:
+        cache.invalidate()
+
+
+def undefined_table(error):
+    """Whether a database error was caused by a missing table or view"""
+    orig = getattr(error, "orig", None)
+    code = getattr(orig, "pgcode", None) or getattr(orig, "sqlstate", None)
+    return code == UNDEFINED_TABLE
+
+
+def without_dropped_views(session, func, *args, **kwargs):
+    """Returns func(session, *args, **kwargs). If that fails because a view
+    it used was dropped after it was found present, checks which views are
+    present again and calls func once more, without the dropped view."""
+    try:
+        return func(session, *args, **kwargs)
+    except ProgrammingError as e:
+        if not undefined_table(e):
+            raise
+    session.rollback()
+    invalidate_view_status()
+    return func(session, *args, **kwargs)
+
+
+def reader_role():
+    """The role the materialized views are made readable by, if any"""
+    return os.getenv("SCIP_READER_ROLE") or None
+
+
+def existing_views(session, names):
+    """Returns the subset of the named relations present in the database
+    that the current user may read"""
+    with maintain_schema("public, salmon_geometry", session):
+        return {
+            name
+            for name in names
+            if session.execute(
+                select(func.has_table_privilege(func.to_regclass(name), "SELECT"))
+            ).scalar()
+        }
+
+
+def refresh_materialized_view(session, name, definition, index_columns):
+    """Creates a materialized view from an SQLAlchemy select, or refreshes
+    it if it already exists. A unique index on index_columns allows the view
+    to be refreshed without blocking queries that read from it."""
+    connection = session.connection()
+    with maintain_schema("public, salmon_geometry", session):
+        if existing_views(session, [name]):
+            connection.exec_driver_sql(
+                "REFRESH MATERIALIZED VIEW CONCURRENTLY {}".format(name)
+            )
+        else:
+            sql = definition.compile(
+                dialect=connection.dialect, compile_kwargs={"literal_binds": True}
+            )
+            connection.exec_driver_sql(
+                "CREATE MATERIALIZED VIEW {} AS {}".format(name, sql)
+            )
+            connection.exec_driver_sql(
+                "CREATE UNIQUE INDEX {0}_key ON {0} ({1})".format(
+                    name, ", ".join(index_columns)
+                )
+            )
+        role = reader_role()
+        if role:
+            connection.exec_driver_sql(
+                "GRANT SELECT ON {} TO {}".format(
+                    name, connection.dialect.identifier_preparer.quote(role)
+                )
+            )
+
+
+def drop_materialized_view(session, name):
+    with maintain_schema("public, salmon_geometry", session):
+        session.connection().exec_driver_sql(
+            "DROP MATERIALIZED VIEW IF EXISTS {}".format(name)
+        )
@@ -0,0 +1,237 @@
+"""
+The region, conservation unit, population and taxon tables are small, and
+this service only reads them, so they can be held in memory and queried
+without a database round trip. Setting SCIP_ENGINE=memory loads them into a
+MemoryStore the first time they are needed; the store is cached like other
+database information (see cache.py), and reloaded when that cache expires or
+is invalidated.
+
+The store holds each row's geoJSON exactly as the database query would
+return it, and a shapely geometry built from it in an STRtree for overlap
+queries, and in a PointIndex for the common case of overlaps that are a
+single point. Populations have the boundaries of their conservation units,
+so they are found from the conservation units a geometry overlaps rather
+than indexed again. The taxons found in each region are loaded from the same
+spatial join the region_taxon view is built from, so species filters give
+the same results as the database.
+
+Overlaps are tested in EPSG 4326 rather than in the database's projection,
+so geometries that only touch the edge of a region may differ from the
+database's answer by up to the rounding error of the projection.
+
+Requests the store can't answer identically - boundaries simplified for a
+zoom level or with reduced precision, and geoJSON output - are answered by
+the database as usual.
+"""
+
+import os
+from collections import namedtuple
+import shapely
+from salmon_occurrence import Region, ConservationUnit, Population, Taxon
+from sqlalchemy import select
+from sqlalchemy_sqlschema import maintain_schema
+from scip.api.cache import BindCache
+from scip.api.point_index import PointIndex
+from scip.api.region_helpers import select_fields, REGION_FIELDS
+from scip.api.region_taxon import region_taxon, region_taxon_available
+from scip.api.region_taxon import lookup_definition
+from scip.api.results import Page, page_results
+from scip.api.timing import phase, record_rows
+
+MemoryRegion = namedtuple(
+    "MemoryRegion", ["id", "name", "code", "outlet", "boundary", "kind", "taxon_ids"]
+)
+MemoryTaxon = namedtuple(
+    "MemoryTaxon", ["id", "common_name", "scientific_name", "subgroup"]
+)
+# a population, with the attributes of its taxon and conservation unit
+MemoryPopulation = namedtuple(
+    "MemoryPopulation",
+    ["id", "common_name", "scientific_name", "subgroup"]
+    + ["name", "code", "outlet", "boundary", "cu_id"],
+)
+
+
+def memory_engine_enabled():
+    return os.getenv("SCIP_ENGINE", "sql").lower() == "memory"
+
+
+class MemoryTable:
+    """Rows with a geoJSON boundary, in id order, spatially indexed"""
+
+    def __init__(self, rows):
+        self.rows = sorted(rows, key=lambda row: row.id)
+        self.shapes = shapely.from_geojson([row.boundary for row in self.rows])
+        shapely.prepare(self.shapes)
+        self.tree = shapely.STRtree(self.shapes)
+        self.points = PointIndex(self.shapes)
+
+    def overlapping(self, shape):
+        """Returns the rows whose boundary intersects shape, in id order"""
+        if shape.geom_type == "Point":
+            return [self.rows[i] for i in self.points.lookup(shape.x, shape.y)]
+        candidates = self.tree.query(shape)
+        hits = candidates[shapely.intersects(self.shapes[candidates], shape)]
+        return [self.rows[i] for i in sorted(hits)]
+
+
+class MemoryStore:
+    def __init__(self, regions, cus, taxons, populations, region_taxons):
+        self.taxons = sorted(taxons, key=lambda taxon: taxon.id)
+        taxons_by_id = {taxon.id: taxon for taxon in self.taxons}
+
+        cu_taxons = {}
+        for population in populations:
+            cu_taxons.setdefault(population.conservation_unit_id, set()).add(
+                population.taxon_id
+            )
+
+        self.regions = {}
+        for row in regions:
+            region = MemoryRegion(
+                *row, taxon_ids=frozenset(region_taxons.get(row.id, ()))
+            )
+            self.regions.setdefault(row.kind, []).append(region)
+        self.regions = {kind: MemoryTable(rows) for kind, rows in self.regions.items()}
+        self.regions["conservation_unit"] = MemoryTable(
+            MemoryRegion(*row, taxon_ids=frozenset(cu_taxons.get(row.id, ())))
+            for row in cus
+        )
+
+        cus_by_id = {cu.id: cu for cu in self.regions["conservation_unit"].rows}
+
+        def memory_population(population):
+            taxon = taxons_by_id[population.taxon_id]
+            cu = cus_by_id[population.conservation_unit_id]
+            return MemoryPopulation(
+                id=population.id,
+                common_name=taxon.common_name,
+                scientific_name=taxon.scientific_name,
+                subgroup=taxon.subgroup,
+                name=cu.name,
+                code=cu.code,
+                outlet=cu.outlet,
+                boundary=cu.boundary,
+                cu_id=cu.id,
+            )
+
+        self.populations = sorted(
+            (memory_population(population) for population in populations),
+            key=lambda population: population.id,
+        )
+        self.cu_populations = {}
+        for population in self.populations:
+            self.cu_populations.setdefault(population.cu_id, []).append(population)
+
+    @staticmethod
+    def answers(zoom=None, format="json", precision=None):
+        """Whether the store can answer a request with these options"""
+        return zoom is None and format == "json" and precision is None
+
+    def taxon_ids(self, common_name, subgroup):
+        return {
+            taxon.id
+            for taxon in self.taxons
+            if taxon.common_name == common_name
+            and (not subgroup or taxon.subgroup == subgroup)
+        }
+
+    def find_regions(
+        self, kind, overlap=None, name=None, code=None, common_name=None, subgroup=None
+    ):
+        """Returns the MemoryRegions matching the region API's filters"""
+        table = self.regions.get(kind)
+        if table is None:
+            return []
+        with phase("memory"):
+            if overlap is not None:
+                rows = table.overlapping(overlap.shape)
+            else:
+                rows = table.rows
+
+            if name:
+                rows = [row for row in rows if row.name == name]
+            if code:
+                rows = [row for row in rows if row.code == code]
+            if common_name:
+                taxon_ids = self.taxon_ids(common_name, subgroup)
+                rows = [row for row in rows if row.taxon_ids & taxon_ids]
+        return rows
+
+    def find_populations(
+        self, overlap=None, common_name=None, subgroup=None, name=None
+    ):
+        """Returns the MemoryPopulations matching the population API's filters"""
+        with phase("memory"):
+            if overlap is not None:
+                cus = self.regions["conservation_unit"].overlapping(overlap.shape)
+                rows = sorted(
+                    (
+                        population
+                        for cu in cus
+                        for population in self.cu_populations.get(cu.id, ())
+                    ),
+                    key=lambda population: population.id,
+                )
+            else:
+                rows = self.populations
+
+            if name:
+                rows = [row for row in rows if row.name == name]
+            if common_name:
+                rows = [row for row in rows if row.common_name == common_name]
+            if subgroup:
+                rows = [row for row in rows if row.subgroup == subgroup]
+        return rows
+
+
+def memory_results(rows, format_row, stream=False, limit=None, cursor=None):
+    """Formats rows found in a MemoryStore the way query_results formats the
+    rows of a database query"""
+    if limit:
+        # the page's key is the rows' id attribute
+        page = Page(None, limit, cursor)
+        return page_results(page.select(rows), format_row, page)
+    if stream:
+        return (format_row(row) for row in rows)
+    record_rows(len(rows))
+    with phase("format"):
+        return [format_row(row) for row in rows]
+
+
+def load_memory_store(session):
+    with maintain_schema("public, salmon_geometry", session):
+        regions = select_fields(session, Region, REGION_FIELDS).all()
+        cus = select_fields(session, ConservationUnit, REGION_FIELDS).all()
+        taxons = session.query(
+            Taxon.id, Taxon.common_name, Taxon.scientific_name, Taxon.subgroup
+        ).all()
+        populations = session.query(
+            Population.id, Population.taxon_id, Population.conservation_unit_id
+        ).all()
+        if region_taxon_available(session):
+            lookup = select(region_taxon.c.region_id, region_taxon.c.taxon_id)
+        else:
+            lookup = lookup_definition()
+        region_taxons = {}
+        for region_id, taxon_id in session.execute(lookup):
+            region_taxons.setdefault(region_id, set()).add(taxon_id)
+
+    return MemoryStore(
+        regions,
+        cus,
+        [MemoryTaxon(*taxon) for taxon in taxons],
+        populations,
+        region_taxons,
+    )
+
+
+_memory_store = BindCache(load_memory_store)
+
+
+def memory_store(session):
+    """Returns the MemoryStore for the session's database, or None if the
+    memory engine isn't enabled"""
+    if not memory_engine_enabled():
+        return None
+    return _memory_store.get(session)
@@ -0,0 +1,266 @@
+"""
+Each API endpoint declares the parameters it accepts with the endpoint
+decorator, as a list of typed Parameter objects. The declaration is compiled
+into a Schema once, when the endpoint is defined, and used both by the
+dispatcher, to pick an endpoint's parameters out of a request, and to
+validate and convert every parameter in one pass before the endpoint
+function runs. The function itself receives parsed values, with defaults
+filled in, and doesn't need to check them again.
+
+Invalid parameters raise a ParameterError, a ValueError naming the
+parameter at fault, which the dispatcher returns to the client as a
+400 response.
+"""
+
+import functools
+from scip.api.input_geometry import parse_geometry
+from scip.api.results import decode_cursor
+from scip.api.timing import phase
+from scip.api.validators import (
+    parse_region_kind,
+    parse_common_name,
+    parse_subgroup,
+    parse_boolean,
+    parse_fields,
+)
+
+
+class ParameterError(ValueError):
+    """An invalid or missing request parameter"""
+
+    def __init__(self, parameter, message):
+        super().__init__(message)
+        self.parameter = parameter
+
+
+class Parameter:
+    """A request parameter, passed to the endpoint unchanged. Parameters that
+    are missing or empty receive the default value."""
+
+    def __init__(self, name, required=False, default=None):
+        self.name = name
+        self.required = required
+        self.default = default
+
+    def convert(self, session, value, parsed):
+        return value
+
+    def parse(self, session, value, parsed):
+        """Returns the parsed value, given the parameters parsed so far"""
+        try:
+            return self.convert(session, value, parsed)
+        except ParameterError:
+            raise
+        except (TypeError, ValueError) as e:
+            raise ParameterError(self.name, str(e))
+
+
+class String(Parameter):
+    def convert(self, session, value, parsed):
+        return str(value)
+
+
+class Enum(Parameter):
+    """One of a set of values found in the database, checked against the
+    cached vocabulary by parser(session, value)"""
+
+    def __init__(self, name, parser, **kwargs):
+        super().__init__(name, **kwargs)
+        self.parser = parser
+
+    def convert(self, session, value, parsed):
+        return self.parser(session, value)
+
+
+class Subgroup(Parameter):
+    """A subgroup of the species given by the common_name parameter"""
+
+    def convert(self, session, value, parsed):
+        if not parsed.get("common_name"):
+            raise ParameterError(
+                self.name, "A subgroup can only be used with a common_name"
+            )
+        return parse_subgroup(session, parsed["common_name"], value)
+
+
+class Geometry(Parameter):
+    """A WKT, geoJSON or WKB geometry in EPSG 4326, parsed to an
+    InputGeometry"""
+
+    def convert(self, session, value, parsed):
+        return parse_geometry(value)
+
+
+class Integer(Parameter):
+    """An integer between minimum and maximum, inclusive. label describes
+    the parameter in error messages."""
+
+    def __init__(self, name, label, minimum=None, maximum=None, **kwargs):
+        super().__init__(name, **kwargs)
+        self.label = label
+        self.minimum = minimum
+        self.maximum = maximum
+
+    def convert(self, session, value, parsed):
+        try:
+            n = int(value)
+        except ValueError:
+            raise ValueError("{} must be an integer: {}".format(self.label, value))
+        if self.minimum is not None and n < self.minimum:
+            raise ValueError(self.range_message(value))
+        if self.maximum is not None and n > self.maximum:
+            raise ValueError(self.range_message(value))
+        return n
+
+    def range_message(self, value):
+        if self.maximum is None:
+            return "{} must be at least {}: {}".format(self.label, self.minimum, value)
+        return "{} must be between {} and {}: {}".format(
+            self.label, self.minimum, self.maximum, value
+        )
+
+
+class TileIndex(Integer):
+    """A tile's column or row, within the grid of tiles at the zoom level
+    given by the z parameter"""
+
+    def __init__(self, name, label, **kwargs):
+        super().__init__(name, label, 0, **kwargs)
+
+    def convert(self, session, value, parsed):
+        n = super().convert(session, value, parsed)
+        size = 2 ** parsed["z"]
+        if n >= size:
+            raise ValueError(
+                "{} must be between 0 and {} at zoom level {}: {}".format(
+                    self.label, size - 1, parsed["z"], value
+                )
+            )
+        return n
+
+
+class Boolean(Parameter):
+    def __init__(self, name, default=False, **kwargs):
+        super().__init__(name, default=default, **kwargs)
+
+    def convert(self, session, value, parsed):
+        return parse_boolean(value)
+
+
+class Choice(Parameter):
+    """One of a fixed set of strings, compared case insensitively"""
+
+    def __init__(self, name, choices, **kwargs):
+        super().__init__(name, **kwargs)
+        self.choices = choices
+
+    def convert(self, session, value, parsed):
+        v = value.lower()
+        if v in self.choices:
+            return v
+        raise ValueError(
+            "Unsupported {}: {}. Supported values: {}".format(
+                self.name, value, ", ".join(self.choices)
+            )
+        )
+
+
+class List(Parameter):
+    """A comma separated list (or a list) of values from allowed, returned
+    in the order they appear in allowed"""
+
+    def __init__(self, name, allowed, **kwargs):
+        super().__init__(name, default=allowed, **kwargs)
+        self.allowed = allowed
+
+    def convert(self, session, value, parsed):
+        return parse_fields(value, self.allowed)
+
+
+class Cursor(Parameter):
+    """A cursor identifying a page of results, returned as given"""
+
+    def convert(self, session, value, parsed):
+        decode_cursor(value)
+        return value
+
+
+# parameter types shared by several endpoints
+def RegionKind(name="kind", **kwargs):
+    return Enum(name, parse_region_kind, **kwargs)
+
+
+def CommonName(name="common_name", **kwargs):
+    return Enum(name, parse_common_name, **kwargs)
+
+
+def Zoom(name="zoom", **kwargs):
+    return Integer(name, "Zoom level", 0, 24, **kwargs)
+
+
+def Limit(name="limit", **kwargs):
+    return Integer(name, "Limit", 1, **kwargs)
+
+
+class Schema:
+    """The parameters of an endpoint, in order. A parameter may depend on
+    parameters that come before it."""
+
+    def __init__(self, *parameters):
+        self.parameters = parameters
+        self.names = [p.name for p in parameters]
+        self.required = [p.name for p in parameters if p.required]
+
+    def select(self, values):
+        """Returns the values of this schema's parameters from a mapping of
+        request parameters, such as request.values, leaving out the rest"""
+        return {
+            name: values.get(name)
+            for name in self.names
+            if values.get(name) is not None
+        }
+
+    def parse(self, session, values):
+        """Returns a dictionary of every parameter, parsed, with missing ones
+        set to their default"""
+        missing = [name for name in self.required if values.get(name) in (None, "")]
+        if missing:
+            raise ParameterError(
+                missing[0], "Missing query parameters: {}".format(", ".join(missing))
+            )
+
+        parsed = {}
+        for p in self.parameters:
+            value = values.get(p.name)
+            if value is None or value == "":
+                parsed[p.name] = p.default
+            else:
+                parsed[p.name] = p.parse(session, value, parsed)
+        return parsed
+
+
+def endpoint(*parameters):
+    """Declares a function to be an API endpoint accepting parameters. The
+    function is called with a session and every parameter, parsed; callers
+    pass a session and any of the parameters, unparsed, as keywords. The
+    compiled Schema is available as the function's `schema` attribute."""
+    schema = Schema(*parameters)
+
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(session, **values):
+            unknown = set(values).difference(schema.names)
+            if unknown:
+                raise TypeError(
+                    "{}() got unexpected parameters: {}".format(
+                        func.__name__, ", ".join(sorted(unknown))
+                    )
+                )
+            with phase("parse"):
+                parsed = schema.parse(session, values)
+            return func(session, **parsed)
+
+        wrapper.schema = schema
+        return wrapper
+
+    return decorate
@@ -0,0 +1,100 @@
+"""
+Most overlap queries are a single point, from a click on the map. A
+PointIndex answers which of a set of geometries contain a point without
+testing the point against any polygon in the common case.
+
+The geometries' extent is divided into a uniform grid of
+SCIP_POINT_GRID_SIZE (default 256) cells along its longer side. When the
+index is built, each cell records the geometries that cover it entirely and
+the geometries whose edge passes through it. A point is looked up by
+finding its cell arithmetically; the geometries covering the cell are
+returned as they are, and only those whose edge crosses the cell are tested
+exactly, against prepared geometries.
+"""
+
+import math
+import os
+import shapely
+
+# a cell with no geometries
+EMPTY = ((), ())
+
+
+def grid_size():
+    return int(os.getenv("SCIP_POINT_GRID_SIZE", 256))
+
+
+class PointIndex:
+    """Locates points in an array of geometries, which may contain None.
+    The geometries should already be prepared."""
+
+    def __init__(self, shapes, size=None):
+        self.shapes = shapes
+        self.cells = {}
+        present = [i for i, shape in enumerate(shapes) if shape is not None]
+        if not present:
+            self.cell_size = None
+            return
+
+        minx, miny, maxx, maxy = shapely.total_bounds(shapes[present])
+        size = size or grid_size()
+        self.minx, self.miny = minx, miny
+        self.cell_size = max(maxx - minx, maxy - miny) / size or 1.0
+        self.columns = int((maxx - minx) / self.cell_size) + 1
+        self.rows = int((maxy - miny) / self.cell_size) + 1
+
+        cells = {}
+        for i in present:
+            self._add(cells, i)
+        self.cells = {
+            cell: (tuple(inside), tuple(edge)) for cell, (inside, edge) in cells.items()
+        }
+
+    def _cell(self, x, y):
+        return (
+            math.floor((x - self.minx) / self.cell_size),
+            math.floor((y - self.miny) / self.cell_size),
+        )
+
+    def _add(self, cells, i):
+        shape = self.shapes[i]
+        minx, miny, maxx, maxy = shape.bounds
+        first_column, first_row = self._cell(minx, miny)
+        last_column, last_row = self._cell(maxx, maxy)
+        keys = [
+            (column, row)
+            for column in range(first_column, last_column + 1)
+            for row in range(first_row, last_row + 1)
+        ]
+        boxes = shapely.box(
+            *zip(
+                *[
+                    (
+                        self.minx + column * self.cell_size,
+                        self.miny + row * self.cell_size,
+                        self.minx + (column + 1) * self.cell_size,
+                        self.miny + (row + 1) * self.cell_size,
+                    )
+                    for column, row in keys
+                ]
+            )
+        )
+        # every point of a box the shape contains intersects it
+        contained = shapely.contains(shape, boxes)
+        crossed = shapely.intersects(shape, boxes) & ~contained
+        for key, inside, edge in zip(keys, contained, crossed):
+            if inside:
+                cells.setdefault(key, ([], []))[0].append(i)
+            elif edge:
+                cells.setdefault(key, ([], []))[1].append(i)
+
+    def lookup(self, x, y):
+        """Returns the sorted indexes of the geometries intersecting the
+        point (x, y)"""
+        if self.cell_size is None:
+            return []
+        inside, edge = self.cells.get(self._cell(x, y), EMPTY)
+        if edge:
+            point = shapely.Point(x, y)
+            edge = [i for i in edge if self.shapes[i].intersects(point)]
+        return sorted(inside + tuple(edge))
@@ -1,11 +1,48 @@
 from salmon_occurrence import ConservationUnit, Taxon, Reference, Population, Phenology
 from sqlalchemy_sqlschema import maintain_schema
 from sqlalchemy_sqlschema.sql import get_schema
-from sqlalchemy import func
-from scip.api.validators import parse_common_name, parse_subgroup
-from scip.api.projection import to_4326, assume_4326
+from sqlalchemy import JSON, cast, func
+from scip.api.parameters import (
+    endpoint,
+    ParameterError,
+    String,
+    Geometry,
+    CommonName,
+    Subgroup,
+    Zoom,
+    Boolean,
+    Choice,
+    List,
+    Limit,
+    Cursor,
+    Integer,
+)
+from scip.api.results import query_results, feature_collection, Page
+from scip.api.projection import intersects_4326
+from scip.api.geometry_store import geojson_4326
+from scip.api.memory_engine import memory_store, memory_results
 
+# the attributes of a population that can be requested, in output order.
+# The last four describe its conservation unit.
+TAXON_FIELDS = ["common_name", "scientific_name", "subgroup"]
+CU_FIELDS = ["name", "code", "outlet", "boundary"]
+POPULATION_FIELDS = TAXON_FIELDS + CU_FIELDS
 
+
+@endpoint(
+    Geometry("overlap"),
+    CommonName(),
+    String("scientific_name"),
+    Subgroup("subgroup"),
+    String("name"),
+    Zoom(),
+    Boolean("stream"),
+    Choice("format", ["json", "geojson"], default="json"),
+    List("fields", POPULATION_FIELDS),
+    Limit(),
+    Cursor("cursor"),
+    Integer("precision", "Precision", 0, 15),
+)
 def population(
     session,
     overlap=None,
@@ -13,48 +50,101 @@ def population(
     scientific_name=None,
     subgroup=None,
     name=None,
+    zoom=None,
+    stream=False,
+    format="json",
+    fields=None,
+    limit=None,
+    cursor=None,
+    precision=None,
 ):
     """Return information about salmon populations in the database that fulfills
     all specified parameters. No parameters are required.
 
     :param session: (sqlalchemy.orm.session.Session) a database Session object
-    :param overlap: a WKT string specifying a geometry that overlaps with the desired populations
+    :param overlap: a geometry in EPSG 4326, as WKT, geoJSON or hex encoded WKB, specifying a geometry that overlaps with the desired populations
     :param common_name: a salmon species - Chinook Chum, Coho, Pink, or Sockeye
     :param subgroup: parameter designating a sub-species taxon, such as `lake` or `river` for sockeye salmon
     :param name: name of the conservation unit that encloses the population's range
+    :param zoom: a web map zoom level (0-24). If supplied, boundaries are simplified
+        to a level of detail suitable for display at that zoom level
+    :param stream: if true, rows are fetched from the database in batches as the
+        result is iterated over, instead of all at once
+    :param format: `json` (the default) for a list of objects as described below, or
+        `geojson` for a geoJSON FeatureCollection with one Feature per population.
+        Each Feature's geometry is the population's `boundary`, and its properties
+        are the other attributes described below, with `outlet` in the
+        `conservation_unit` object. Streaming does not apply to geoJSON output.
+    :param fields: a comma separated list of the attributes to return for each population,
+        from `common_name`, `scientific_name`, `subgroup`, `name`, `code`, `boundary`
+        and `outlet`. Defaults to all of them. Requests that don't need geometry are
+        much faster without `boundary` and `outlet`. Features in geoJSON output always
+        have their boundary as geometry.
+    :param limit: the maximum number of populations to return. If supplied, the response
+        is an object with the list of populations in `results`, and a `next` cursor that
+        can be passed back to get the next page of populations, or null if there are no
+        more. In geoJSON output, `next` is a member of the FeatureCollection. Streaming
+        does not apply to paged results.
+    :param cursor: the `next` cursor from the previous page of results
+    :param precision: the number of decimal places (0-15) to give coordinates in
+        geometries. Defaults to 9; 5 (about a metre) is plenty for display on a map,
+        and makes responses much smaller.
 
-    :return: a list of objects representing salmon populations that fulfill the given parameters. In
+    :return: a list (or if streaming, an iterator) of objects representing salmon populations that fulfill the given parameters. In
         addition to `common_name`, `scientific_name`, `subgroup`, and `name`, two geoJSON strings describing
         the geometry of the population7s extent are provided. `boundary` describes the outline of the extent,
         and `outlet` provides the most downstream point of the extent according to the RVIC routed flow data.
 
     """
-    if common_name:
-        common_name = parse_common_name(session, common_name)
-    if subgroup:
-        subgroup = parse_subgroup(session, common_name, subgroup)
+    query_fields = fields
+    if cursor and not limit:
+        raise ParameterError("cursor", "A cursor can only be used with a limit")
+    page = Page(Population.id, limit, cursor) if limit else None
+    if format == "geojson" and "boundary" not in fields:
+        query_fields = fields + ["boundary"]
+
+    def population_dict(result):
+        x = {att: getattr(result, att) for att in fields if att in TAXON_FIELDS}
+        cu = {att: getattr(result, att) for att in fields if att in CU_FIELDS}
+        if cu:
+            x["conservation_unit"] = cu
+        return x
+
+    store = memory_store(session)
+    if store and store.answers(zoom, format, precision):
+        rows = store.find_populations(overlap, common_name, subgroup, name)
+        return memory_results(rows, population_dict, stream, limit, cursor)
 
     # TODO: return additional data
 
     with maintain_schema("public, salmon_geometry", session):
+        columns = {
+            "common_name": Taxon.common_name,
+            "scientific_name": Taxon.scientific_name,
+            "subgroup": Taxon.subgroup,
+            "name": ConservationUnit.name,
+            "code": ConservationUnit.code,
+        }
+        geometry = None
+        if "boundary" in query_fields or "outlet" in query_fields:
+            geometry = geojson_4326(session, ConservationUnit, zoom, precision)
+            columns["boundary"] = geometry.boundary
+            columns["outlet"] = geometry.outlet
+
         q = (
             session.query(
-                Taxon.common_name.label("common_name"),
-                Taxon.scientific_name.label("scientific_name"),
-                Taxon.subgroup.label("subgroup"),
-                ConservationUnit.name.label("name"),
-                ConservationUnit.code.label("code"),
-                func.ST_AsGeoJSON(to_4326(ConservationUnit.boundary)).label("boundary"),
-                func.ST_ASGeoJSON(to_4326(ConservationUnit.outlet)).label("outlet"),
+                Population.id.label("id"),
+                *[columns[field].label(field) for field in query_fields],
             )
+            .select_from(ConservationUnit)
             .join(Population, Population.conservation_unit_id == ConservationUnit.id)
             .join(Taxon, Population.taxon_id == Taxon.id)
         )
+        if geometry:
+            q = geometry.join(q)
 
         if overlap:
-            q = q.filter(
-                to_4326(ConservationUnit.boundary).ST_Intersects(assume_4326(overlap))
-            )
+            q = q.filter(intersects_4326(ConservationUnit.boundary, overlap))
 
         if name:
             q = q.filter(ConservationUnit.name == name)
@@ -64,32 +154,24 @@ def population(
         if subgroup:
             q = q.filter(Taxon.subgroup == subgroup)
 
-        results = q.all()
-
-        result_list = [
-            {
-                att: getattr(result, att)
-                for att in [
-                    "common_name",
-                    "scientific_name",
-                    "subgroup",
-                    "name",
-                    "code",
-                    "outlet",
-                    "boundary",
+        if format == "geojson":
+
+            def population_properties(columns):
+                properties = [
+                    (field, columns[field]) for field in fields if field in TAXON_FIELDS
                 ]
-            }
-            for result in results
-        ]
-
-        def cu_dict(x):
-            cu = {}
-            for key in ["name", "code", "outlet", "boundary"]:
-                val = x.pop(key)
-                cu[key] = val
-            x["conservation_unit"] = cu
-            return x
+                cu = []
+                for field in fields:
+                    if field == "outlet":
+                        cu += [field, cast(columns.outlet, JSON)]
+                    elif field in ["name", "code"]:
+                        cu += [field, columns[field]]
+                if cu:
+                    properties.append(
+                        ("conservation_unit", func.json_build_object(*cu))
+                    )
+                return properties
 
-        result_list = list(map(cu_dict, result_list))
+            return feature_collection(session, q, population_properties, page=page)
 
-        return result_list
+        return query_results(session, q, population_dict, stream, page)
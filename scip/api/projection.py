@@ -2,22 +2,18 @@
 # particular projection, but we assume it to be EPSG 4326 for convenience
 # functions in this file convert between the two systems.
 
-# use assume_4326 on parameters received from the front end, to add a projection
 # use to_4326 on data fetched from the back end, to convert it to EPSG 4236
+# use intersects_4326 to filter database geometries by a front end geometry
 
-# All geoJSON is officially defined as 4326 as of 2016.
-# See https://www.rfc-editor.org/rfc/rfc7946#section-4
-# So assume_4326 should theoretically just be able to convert
-# any WKT string to geoJSON and have that be sufficient to establish
-# the geometry as 4326. However, we got errors doing this, so we are
-# still using the deprecated "crs" attribute with our geoJSON strings.
-# TODO: determine source of those errors, switch to modern geoJSON
-# handling.
+# Geometries from the front end are parsed and sent to the database with
+# their projection set by input_geometry.py.
 
-from sqlalchemy import func
-import shapely.wkt
-import geojson
-import json
+from sqlalchemy import and_, func
+from scip.api.input_geometry import bind_geometry
+
+
+# BC Albers, the projection geometries are stored in by the database
+DATABASE_SRID = 3005
 
 
 def to_4326(geom):
@@ -25,10 +21,14 @@ def to_4326(geom):
     return func.ST_Transform(geom, 4326)
 
 
-def assume_4326(wkt):
-    """convert a WKT string (no projection) to an equivalent geoJSON string in WPSG 4326"""
-    shape = shapely.wkt.loads(wkt)
-    gj = json.loads(geojson.dumps(shape))
-    gj["crs"] = {"type": "name", "properties": {"name": "epsg:4326"}}
+def intersects_4326(column, geometry):
+    """filter clause matching rows where a database geometry column intersects
+    a geometry from the front end (WKT, geoJSON, WKB, or an already parsed
+    InputGeometry, assumed to be EPSG 4326).
 
-    return json.dumps(gj)
+    The geometry is transformed into the database's projection, rather
+    than transforming every stored geometry into EPSG 4326, so that the
+    comparison can use the spatial index on the column. The bounding box
+    comparison (&&) is an explicit index-only prefilter."""
+    geom = func.ST_Transform(bind_geometry(geometry), DATABASE_SRID)
+    return and_(column.op("&&", is_comparison=True)(geom), column.ST_Intersects(geom))
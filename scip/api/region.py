@@ -1,39 +1,114 @@
 from sqlalchemy_sqlschema import maintain_schema
 from sqlalchemy_sqlschema.sql import get_schema
-from scip.api.validators import parse_region_kind, parse_common_name, parse_subgroup
-from scip.api.region_helpers import build_cu_query, build_region_query
+from sqlalchemy import JSON, cast
+from salmon_occurrence import Region, ConservationUnit
+from scip.api.parameters import (
+    endpoint,
+    ParameterError,
+    String,
+    Geometry,
+    RegionKind,
+    CommonName,
+    Subgroup,
+    Zoom,
+    Boolean,
+    Choice,
+    List,
+    Limit,
+    Cursor,
+    Integer,
+)
+from scip.api.region_helpers import build_cu_query, build_region_query, REGION_FIELDS
+from scip.api.results import query_results, feature_collection, Page
+from scip.api.memory_engine import memory_store, memory_results
 
 
+@endpoint(
+    RegionKind(required=True),
+    Geometry("overlap"),
+    String("name"),
+    String("code"),
+    CommonName(),
+    Subgroup("subgroup"),
+    Zoom(),
+    Boolean("stream"),
+    Choice("format", ["json", "geojson"], default="json"),
+    List("fields", REGION_FIELDS),
+    Limit(),
+    Cursor("cursor"),
+    Integer("precision", "Precision", 0, 15),
+)
 def region(
-    session, kind, overlap=None, name=None, code=None, common_name=None, subgroup=None
+    session,
+    kind,
+    overlap=None,
+    name=None,
+    code=None,
+    common_name=None,
+    subgroup=None,
+    zoom=None,
+    stream=False,
+    format="json",
+    fields=None,
+    limit=None,
+    cursor=None,
+    precision=None,
 ):
     """Return information about regions in the database that meet
     the specified parameters.
 
     :param session: (sqlalchemy.orm.session.Session) a database Session object
     :param kind: the type of region, such as `watershed`, `basin` or `conservation_unit`
-    :param overlap: a WKT string specifying a geometry that overlaps with the desired region
+    :param overlap: a geometry in EPSG 4326, as WKT, geoJSON or hex encoded WKB, specifying a geometry that overlaps with the desired region
     :param name: a string denoting the full name of the region
     :param code: a four letter unique code assigned to the region
     :param common_name: a salmon species - Chinook Chum, Coho, Pink, or Sockeye
     :param subgroup: a species subtype
+    :param zoom: a web map zoom level (0-24). If supplied, region boundaries are
+        simplified to a level of detail suitable for display at that zoom level
+    :param stream: if true, rows are fetched from the database in batches as the
+        result is iterated over, instead of all at once
+    :param format: `json` (the default) for a list of objects as described below, or
+        `geojson` for a geoJSON FeatureCollection with one Feature per region. Each
+        Feature's geometry is the region's boundary, and its properties are the
+        region's `name`, `code`, `kind`, and `outlet`. Streaming does not apply to
+        geoJSON output.
+    :param fields: a comma separated list of the attributes to return for each region,
+        from `name`, `code`, `kind`, `boundary`, and `outlet`. Defaults to all of them.
+        Requests that don't need geometry are much faster without `boundary` and
+        `outlet`. Features in geoJSON output always have their boundary as geometry.
+    :param limit: the maximum number of regions to return. If supplied, the response is
+        an object with the list of regions in `results`, and a `next` cursor that can be
+        passed back to get the next page of regions, or null if there are no more. In
+        geoJSON output, `next` is a member of the FeatureCollection. Streaming does not
+        apply to paged results.
+    :param cursor: the `next` cursor from the previous page of results
+    :param precision: the number of decimal places (0-15) to give coordinates in
+        geometries. Defaults to 9; 5 (about a metre) is plenty for display on a map,
+        and makes responses much smaller.
 
-    :return: a list of objects representing regions that fulfill all the specified criteria.
+    :return: a list (or if streaming, an iterator) of objects representing regions that fulfill all the specified criteria.
         For each region, the `kind`, `name`, and `code` are provided, along with two
         geoJSON objects representing the region's geometry: `boundary` describes the
         region's extent, and `outlet` is a geoJSON point representing the most downstream
         grid cell in the region, according to RVIC's flow model.
 
     """
-    with maintain_schema("public, salmon_geometry", session):
-        # check parameters
-        kind = parse_region_kind(session, kind)
-        if common_name:
-            common_name = parse_common_name(session, common_name)
-        if subgroup:
-            subgroup = parse_subgroup(session, common_name, subgroup)
+    if cursor and not limit:
+        raise ParameterError("cursor", "A cursor can only be used with a limit")
+
+    def region_dict(result):
+        return {att: getattr(result, att) for att in fields}
+
+    store = memory_store(session)
+    if store and store.answers(zoom, format, precision):
+        rows = store.find_regions(kind, overlap, name, code, common_name, subgroup)
+        return memory_results(rows, region_dict, stream, limit, cursor)
 
-        # TODO: check overlap, see https://github.com/pacificclimate/scip-frontend/issues/43
+    with maintain_schema("public, salmon_geometry", session):
+        query_fields = fields
+        if format == "geojson" and "boundary" not in fields:
+            query_fields = fields + ["boundary"]
 
         # This API presents data from multiple locations in the database, depending
         # on the values of the "kind" attribute. Some regions consist only of
@@ -46,25 +121,50 @@ def region(
         # being asked about.
 
         if kind == "conservation_unit":
-            q = build_cu_query(session, overlap, name, code, common_name, subgroup)
+            q = build_cu_query(
+                session,
+                overlap,
+                name,
+                code,
+                common_name,
+                subgroup,
+                zoom,
+                query_fields,
+                precision,
+            )
         else:
             q = build_region_query(
-                session, kind, overlap, name, code, common_name, subgroup
+                session,
+                kind,
+                overlap,
+                name,
+                code,
+                common_name,
+                subgroup,
+                zoom,
+                query_fields,
+                precision,
             )
-        results = q.all()
 
-        result_list = [
-            {
-                att: getattr(result, att)
-                for att in ["name", "code", "outlet", "boundary"]
-            }
-            for result in results
-        ]
+        page = None
+        if limit:
+            if kind == "conservation_unit":
+                page = Page(ConservationUnit.id, limit, cursor)
+            else:
+                page = Page(Region.id, limit, cursor)
+
+        if format == "geojson":
 
-        def assign_kind(x):
-            x["kind"] = kind
-            return x
+            def region_properties(columns):
+                properties = [
+                    (field, columns[field])
+                    for field in fields
+                    if field not in ["boundary", "outlet"]
+                ]
+                if "outlet" in fields:
+                    properties.append(("outlet", cast(columns.outlet, JSON)))
+                return properties
 
-        result_list = list(map(assign_kind, result_list))
+            return feature_collection(session, q, region_properties, page=page)
 
-        return result_list
+        return query_results(session, q, region_dict, stream, page)
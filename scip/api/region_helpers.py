@@ -13,59 +13,97 @@ that might need to be constructed:
  2. conservation unit without species: build_cu_query -> cu_geometry_only
  3. other region with species: build_region_query -> region_with_taxon
  4. other region without species: build_region_query -> region_geometry_only
+
+Regions with a species are found with a semi-join (WHERE id IN ...) on the
+taxons present in each region, rather than by joining every population and
+then removing duplicate regions with DISTINCT.
 """
 
 from salmon_occurrence import Region, ConservationUnit, Population, Taxon
-from sqlalchemy import func
-from scip.api.projection import to_4326, assume_4326
+from sqlalchemy import func, literal, select
+from scip.api.projection import intersects_4326
+from scip.api.geometry_store import geojson_4326
+from scip.api.region_taxon import region_taxon, region_taxon_available
+
+# the attributes of a region that can be requested, in output order
+REGION_FIELDS = ["name", "code", "outlet", "boundary", "kind"]
+
+
+def select_fields(session, model, fields, zoom=None, precision=None):
+    """Returns a query selecting the requested fields from the Region or
+    ConservationUnit table. The geometry columns are only transformed if
+    they are requested. The table's id is always selected, so that regions
+    with identical attributes remain distinct rows."""
+    if model is Region:
+        kind = Region.kind
+    else:
+        kind = literal("conservation_unit")
+    columns = {"name": model.name, "code": model.code, "kind": kind}
+
+    geometry = None
+    if "boundary" in fields or "outlet" in fields:
+        geometry = geojson_4326(session, model, zoom, precision)
+        columns["boundary"] = geometry.boundary
+        columns["outlet"] = geometry.outlet
+
+    q = session.query(
+        model.id.label("id"), *[columns[field].label(field) for field in fields]
+    )
+    if geometry:
+        q = geometry.join(q)
+    return q
 
 
-def cu_with_taxon(session, common_name, subgroup):
-    """Returns a query that joins the conservation unit table
-    with the population table, in order to get a list of
+def cu_with_taxon(
+    session, common_name, subgroup, zoom=None, fields=REGION_FIELDS, precision=None
+):
+    """Returns a query that uses the population table to get a list of
     conservation units that contain a particular salmon species"""
-    q = cu_geometry_only(session)
+    q = cu_geometry_only(session, zoom, fields, precision)
 
-    q = q.join(
-        Population,
-        Population.conservation_unit_id == ConservationUnit.id,
+    cus = select(Population.conservation_unit_id).join(
+        Taxon, Population.taxon_id == Taxon.id
     )
-    q = q.join(Taxon, Population.taxon_id == Taxon.id)
-    q = q.filter(Taxon.common_name == common_name)
+    cus = filter_taxon(cus, common_name, subgroup)
+    q = q.filter(ConservationUnit.id.in_(cus))
+
+    return q
 
-    if subgroup:
-        q = q.filter(Taxon.subgroup == subgroup)
-    q = q.distinct()
 
+def filter_taxon(q, common_name, subgroup):
+    """Restricts a query involving the Taxon table to a species and
+    optionally a subgroup"""
+    q = q.where(Taxon.common_name == common_name)
+    if subgroup:
+        q = q.where(Taxon.subgroup == subgroup)
     return q
 
 
-def cu_geometry_only(session):
+def cu_geometry_only(session, zoom=None, fields=REGION_FIELDS, precision=None):
     """Returns a simple query on the conservation unit table"""
-    q = session.query(
-        ConservationUnit.name.label("name"),
-        ConservationUnit.code.label("code"),
-        func.ST_AsGeoJSON(to_4326(ConservationUnit.boundary)).label("boundary"),
-        func.ST_ASGeoJSON(to_4326(ConservationUnit.outlet)).label("outlet"),
-    )
-
-    return q
+    return select_fields(session, ConservationUnit, fields, zoom, precision)
 
 
 def build_cu_query(
-    session, overlap=None, name=None, code=None, common_name=None, subgroup=None
+    session,
+    overlap=None,
+    name=None,
+    code=None,
+    common_name=None,
+    subgroup=None,
+    zoom=None,
+    fields=REGION_FIELDS,
+    precision=None,
 ):
     """Creates an SQLalchemy query to get information about
     conservation units"""
     if common_name:
-        q = cu_with_taxon(session, common_name, subgroup)
+        q = cu_with_taxon(session, common_name, subgroup, zoom, fields, precision)
     else:
-        q = cu_geometry_only(session)
+        q = cu_geometry_only(session, zoom, fields, precision)
 
     if overlap:
-        q = q.filter(
-            to_4326(ConservationUnit.boundary).ST_Intersects(assume_4326(overlap))
-        )
+        q = q.filter(intersects_4326(ConservationUnit.boundary, overlap))
 
     if name:
         q = q.filter(ConservationUnit.name == name)
@@ -76,52 +114,78 @@ def build_cu_query(
     return q
 
 
-def region_with_taxon(session, kind, common_name, subgroup):
-    """Returns a query that spatially joins the regions table with the
+def region_with_taxon(
+    session,
+    kind,
+    common_name,
+    subgroup,
+    zoom=None,
+    fields=REGION_FIELDS,
+    precision=None,
+):
+    """Returns a query on the regions table restricted to regions containing
+    a particular salmon species. Uses the precomputed region-taxon lookup if
+    it is available, otherwise spatially joins the regions table with the
     conservation units table, in order to access salmon population info"""
-    q = region_geometry_only(session, kind)
-    q = q.join(
-        ConservationUnit,
-        ConservationUnit.boundary.ST_Intersects(Region.boundary),
-    )
-    q = q.join(
-        Population,
-        Population.conservation_unit_id == ConservationUnit.id,
-    )
-    q = q.join(Taxon, Population.taxon_id == Taxon.id)
-    q = q.filter(Taxon.common_name == common_name)
+    q = region_geometry_only(session, kind, zoom, fields, precision)
 
-    if subgroup:
-        q = q.filter(Taxon.subgroup == subgroup)
-    q = q.distinct()
+    if region_taxon_available(session):
+        regions = select(region_taxon.c.region_id).join(
+            Taxon, region_taxon.c.taxon_id == Taxon.id
+        )
+    else:
+        regions = (
+            select(Region.id)
+            .join(
+                ConservationUnit,
+                ConservationUnit.boundary.ST_Intersects(Region.boundary),
+            )
+            .join(
+                Population,
+                Population.conservation_unit_id == ConservationUnit.id,
+            )
+            .join(Taxon, Population.taxon_id == Taxon.id)
+            .where(Region.kind == kind)
+            .correlate(None)
+        )
+    regions = filter_taxon(regions, common_name, subgroup)
+    q = q.filter(Region.id.in_(regions))
 
     return q
 
 
-def region_geometry_only(session, kind):
+def region_geometry_only(
+    session, kind, zoom=None, fields=REGION_FIELDS, precision=None
+):
     """Returns a simple query on the regions table"""
-    q = session.query(
-        Region.name.label("name"),
-        Region.code.label("code"),
-        Region.kind.label("kind"),
-        func.ST_AsGeoJSON(to_4326(Region.boundary)).label("boundary"),
-        func.ST_AsGeoJSON(to_4326(Region.outlet)).label("outlet"),
-    ).filter(Region.kind == kind)
+    q = select_fields(session, Region, fields, zoom, precision)
+    q = q.filter(Region.kind == kind)
 
     return q
 
 
 def build_region_query(
-    session, kind, overlap=None, name=None, code=None, common_name=None, subgroup=None
+    session,
+    kind,
+    overlap=None,
+    name=None,
+    code=None,
+    common_name=None,
+    subgroup=None,
+    zoom=None,
+    fields=REGION_FIELDS,
+    precision=None,
 ):
     """Creates and SQLAlchemy query to get information about watersheds or basins"""
     if common_name:
-        q = region_with_taxon(session, kind, common_name, subgroup)
+        q = region_with_taxon(
+            session, kind, common_name, subgroup, zoom, fields, precision
+        )
     else:
-        q = region_geometry_only(session, kind)
+        q = region_geometry_only(session, kind, zoom, fields, precision)
 
     if overlap:
-        q = q.filter(to_4326(Region.boundary).ST_Intersects(assume_4326(overlap)))
+        q = q.filter(intersects_4326(Region.boundary, overlap))
 
     if name:
         q = q.filter(Region.name == name)
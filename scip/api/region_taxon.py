@@ -0,0 +1,65 @@
+"""
+Finding the regions where a salmon species is present requires a spatial
+join between regions and conservation units, which is much the slowest part
+of a species-filtered region query. Since it only changes when new data is
+loaded, `flask precompute` stores which taxons are found in each region in a
+materialized view, which region queries use instead of the spatial join
+when it is present.
+
+Regions added after the view was last refreshed are not listed in it, so
+it should be refreshed after every data load.
+"""
+
+from salmon_occurrence import Region, ConservationUnit, Population
+from sqlalchemy import MetaData, Table, Column, Integer, select
+from scip.api.materialized_views import (
+    existing_views,
+    invalidate_view_status,
+    refresh_materialized_view,
+    drop_materialized_view,
+    view_status,
+)
+
+metadata = MetaData()
+
+region_taxon = Table(
+    "region_taxon",
+    metadata,
+    Column("region_id", Integer, primary_key=True),
+    Column("taxon_id", Integer, primary_key=True),
+)
+
+
+def lookup_definition():
+    """Returns the query the region-taxon materialized view is built from"""
+    return (
+        select(Region.id.label("region_id"), Population.taxon_id.label("taxon_id"))
+        .join(
+            ConservationUnit, ConservationUnit.boundary.ST_Intersects(Region.boundary)
+        )
+        .join(Population, Population.conservation_unit_id == ConservationUnit.id)
+        .distinct()
+    )
+
+
+def refresh_region_taxon(session):
+    # region queries look up the regions where a taxon is found, so the
+    # index leads with taxon_id
+    refresh_materialized_view(
+        session, region_taxon.name, lookup_definition(), ["taxon_id", "region_id"]
+    )
+    invalidate_view_status()
+
+
+def drop_region_taxon(session):
+    drop_materialized_view(session, region_taxon.name)
+    invalidate_view_status()
+
+
+_lookup_status = view_status(
+    lambda session: bool(existing_views(session, [region_taxon.name]))
+)
+
+
+def region_taxon_available(session):
+    return _lookup_status.get(session)
@@ -0,0 +1,82 @@
+"""
+A small number of distinct queries (all watersheds, all conservation units
+for a species, etc.) make up most of the API's traffic. Responses are cached
+in memory, keyed on the endpoint and its parameters, normalized so that
+trivially different requests for the same data share a cache entry.
+
+The cache holds at most SCIP_RESPONSE_CACHE_BYTES (default 64 MiB) of
+response bodies, compressed and uncompressed, and is cleared along with the other caches. Setting it to
+0 disables response caching.
+"""
+
+import hashlib
+import os
+from collections import namedtuple
+from scip.api.cache import LRUCache
+from scip.api.input_geometry import parse_geometry
+
+# body: the response body
+# etag: the entity tag of the uncompressed body
+# encodings: a dictionary of compressed variants of the body (see compression.py)
+CachedResponse = namedtuple("CachedResponse", ["body", "etag", "encodings"])
+
+
+def casefold(value):
+    return value.casefold()
+
+
+def normalize_geometry(value):
+    # equivalent geometries may list their vertices in a different order or
+    # starting point; normalization puts them in a canonical order.
+    # The parsed geometry is cached, so it isn't parsed again to answer the
+    # request.
+    try:
+        return parse_geometry(value).normalized
+    except ValueError:
+        return value
+
+
+def normalize_integer(value):
+    try:
+        return str(int(value))
+    except ValueError:
+        return value
+
+
+def normalize_list(value):
+    return ",".join(sorted(v.strip().lower() for v in value.split(",")))
+
+
+# parameters not listed here are compared exactly
+normalizers = {
+    "kind": casefold,
+    "common_name": casefold,
+    "subgroup": casefold,
+    "overlap": normalize_geometry,
+    "zoom": normalize_integer,
+    "limit": normalize_integer,
+    "precision": normalize_integer,
+    "fields": normalize_list,
+}
+
+
+def cache_key(request_type, params):
+    """Returns a hashable key identifying an API request"""
+    return (request_type,) + tuple(
+        sorted(
+            (param, normalizers.get(param, str)(value))
+            for param, value in params.items()
+        )
+    )
+
+
+def etag(body):
+    """Returns a strong entity tag for a response body"""
+    return hashlib.sha256(body).hexdigest()
+
+
+response_cache = LRUCache(
+    int(os.getenv("SCIP_RESPONSE_CACHE_BYTES", 64 * 1024 * 1024)),
+    sizeof=lambda response: len(response.body)
+    + sum(len(variant) for variant in response.encodings.values()),
+)
@@ -0,0 +1,177 @@
+"""
+Helper functions that turn the results of an endpoint's query into the
+data it returns.
+
+Normally every row is fetched from the database and formatted into a list.
+Endpoints that can return very large results also offer a streaming mode,
+where rows are fetched from a server-side cursor in batches as the response
+is written, so the whole result never needs to be held in memory at once.
+
+Results can also be returned as a geoJSON FeatureCollection, whose features
+are assembled entirely by PostgreSQL and passed through as a string, so the
+geometries are never parsed or re-encoded in Python.
+
+Results may be split into pages, using keyset pagination: rows are ordered
+by their id, and each page includes an opaque cursor encoding the last id on
+the page, which is used to request the rows after it.
+"""
+
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from itertools import chain
+from json import dumps, loads
+from sqlalchemy import JSON, Text, cast, func, literal_column, select
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from sqlalchemy_sqlschema import maintain_schema
+from scip.api import serializer
+from scip.api.timing import phase, record_rows
+
+# number of rows fetched from the database at a time when streaming
+STREAM_BATCH_SIZE = 100
+
+
+def encode_cursor(key):
+    return urlsafe_b64encode(dumps(key).encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        key = loads(urlsafe_b64decode(cursor.encode()))
+    except ValueError:
+        key = None
+    if not isinstance(key, int):
+        raise ValueError("Invalid cursor: {}".format(cursor))
+    return key
+
+
+class Page:
+    """Describes one page of a query's results: at most limit rows ordered
+    by the key column, starting after the row identified by cursor."""
+
+    def __init__(self, key, limit, cursor=None):
+        self.key = key
+        self.limit = limit
+        self.after = decode_cursor(cursor) if cursor else None
+
+    def apply(self, q):
+        """Restricts a query to this page, plus one row, which if present
+        shows there is a next page."""
+        if self.after is not None:
+            q = q.filter(self.key > self.after)
+        return q.order_by(self.key).limit(self.limit + 1)
+
+    def select(self, rows):
+        """Like apply, for a list of rows in order of their id attribute"""
+        if self.after is not None:
+            rows = [row for row in rows if row.id > self.after]
+        return rows[: self.limit + 1]
+
+    def next_cursor(self, count, last_key):
+        """Returns the cursor for the next page, given the number of rows
+        fetched by the applied query and the key of the last row on this page"""
+        if count > self.limit:
+            return encode_cursor(last_key)
+        return None
+
+
+def query_results(session, q, format_row, stream=False, page=None):
+    """Returns the rows of a query, each formatted by format_row, as a list,
+    or if stream is true, as a generator that runs the query when iterated.
+    If a Page is given, returns a dictionary with that page of results, and
+    the cursor for the next one, or None if this is the last page."""
+    if page:
+        with phase("query"):
+            rows = page.apply(q).all()
+        return page_results(rows, format_row, page)
+    if stream:
+        return stream_results(session, q, format_row)
+    with phase("query"):
+        rows = q.all()
+    record_rows(len(rows))
+    with phase("format"):
+        return [format_row(row) for row in rows]
+
+
+def page_results(rows, format_row, page):
+    """Returns a page of results, given the rows fetched by a query the Page
+    was applied to"""
+    with phase("format"):
+        results = [format_row(row) for row in rows[: page.limit]]
+    record_rows(len(results))
+    last_key = rows[page.limit - 1].id if len(rows) > page.limit else None
+    return {"results": results, "next": page.next_cursor(len(rows), last_key)}
+
+
+def stream_results(session, q, format_row):
+    # the generator runs after the endpoint function has returned, so it
+    # needs to set up the schema itself.
+    with maintain_schema("public, salmon_geometry", session):
+        for row in q.yield_per(STREAM_BATCH_SIZE):
+            yield format_row(row)
+
+
+def json_array(items):
+    """Serializes an iterable to a JSON array, one item at a time"""
+    yield b"["
+    for i, item in enumerate(items):
+        if i:
+            yield b","
+        yield serializer.dumps(item)
+    yield b"]"
+
+
+class RawJSON(str):
+    """A string that is already JSON, and should be sent as-is"""
+
+
+def feature_collection(session, q, properties, geometry="boundary", page=None):
+    """Returns the rows of a query as a geoJSON FeatureCollection, in a RawJSON
+    string. Each feature's geometry is the query's geoJSON geometry column,
+    and its properties are built by properties(columns), which receives the
+    columns of the query and returns a list of (property name, column)
+    pairs. Properties that are geoJSON strings must be cast to JSON.
+    If a Page is given, the collection has only that page of features, and a
+    `next` member with the cursor for the next page."""
+    if page:
+        # rows are numbered after the query's own DISTINCT (if any) is applied
+        rows = page.apply(q).subquery()
+        columns = (
+            select(rows, func.row_number().over(order_by=rows.c.id).label("row_number"))
+            .subquery()
+            .c
+        )
+    else:
+        columns = q.subquery().c
+
+    feature = func.json_build_object(
+        "type",
+        "Feature",
+        "geometry",
+        cast(columns[geometry], JSON),
+        "properties",
+        func.json_build_object(*chain.from_iterable(properties(columns))),
+    )
+    features = func.json_agg(feature)
+    last_key = func.max(columns.id)
+    if page:
+        on_page = columns.row_number <= page.limit
+        features = func.json_agg(aggregate_order_by(feature, columns.id)).filter(
+            on_page
+        )
+        last_key = last_key.filter(on_page)
+
+    with maintain_schema("public, salmon_geometry", session), phase("query"):
+        collection, count, last_key = session.execute(
+            select(
+                cast(func.coalesce(features, literal_column("'[]'::json")), Text),
+                func.count(),
+                last_key,
+            )
+        ).one()
+
+    record_rows(min(count, page.limit) if page else count)
+
+    # only the small wrapper around the features is assembled in Python
+    members = ['"type": "FeatureCollection"', '"features": {}'.format(collection)]
+    if page:
+        members.append('"next": {}'.format(dumps(page.next_cursor(count, last_key))))
+    return RawJSON("{{{}}}".format(", ".join(members)))
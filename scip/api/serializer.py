@@ -0,0 +1,36 @@
+"""
+Serializes API results to JSON. Large responses spend noticeable time in
+the serializer, so the faster orjson package is used if it is installed.
+SCIP_JSON_SERIALIZER selects the serializer when the API starts: `orjson`
+(the default) or `json`, the standard library's, which is also used when
+orjson isn't installed.
+"""
+
+import json
+import os
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _stdlib_dumps(obj):
+    return json.dumps(obj).encode()
+
+
+def _select_serializer():
+    name = os.getenv("SCIP_JSON_SERIALIZER", "orjson").lower()
+    if name not in {"orjson", "json"}:
+        raise ValueError(
+            "Unknown SCIP_JSON_SERIALIZER: {}. Supported serializers: orjson, json".format(
+                name
+            )
+        )
+    if name == "orjson" and orjson:
+        return orjson.dumps
+    return _stdlib_dumps
+
+
+# dumps(obj) returns obj serialized as JSON, in UTF-8 encoded bytes
+dumps = _select_serializer()
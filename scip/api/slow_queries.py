@@ -0,0 +1,168 @@
+"""
+An opt-in record of slow database queries, to find out which queries are
+slow and why - for example, an overlap filter that can't use a spatial index
+and scans the whole table.
+
+Setting SCIP_SLOW_QUERY_MS records every statement that takes longer than
+that many milliseconds, with its parameters and the request it was made for.
+A fraction of them, SCIP_SLOW_QUERY_EXPLAIN_RATE (default 0.1), are run again
+with EXPLAIN (ANALYZE, BUFFERS) to record the plan PostgreSQL used. That runs
+the query a second time, on the same connection, before the request
+continues, so it should be kept low. Only SELECT statements are explained.
+
+The most recent SCIP_SLOW_QUERY_BUFFER (default 100) slow queries are kept
+in memory by each worker process, and served, newest first, from
+/api/admin/slow-queries. That endpoint requires SCIP_ADMIN_TOKEN as a bearer
+token, and refuses every request if no token is set.
+"""
+
+import hmac
+import os
+import random
+import threading
+from collections import deque
+from datetime import datetime, timezone
+from time import perf_counter
+from flask import has_request_context, request
+from sqlalchemy import event
+
+# parameter values longer than this are abbreviated
+MAX_PARAMETER_LENGTH = 200
+
+
+def slow_query_threshold():
+    """The duration in seconds above which queries are recorded, or None if
+    slow queries aren't recorded"""
+    value = os.getenv("SCIP_SLOW_QUERY_MS")
+    return float(value) / 1000 if value else None
+
+
+def format_parameter(value):
+    """Returns a parameter value as it should be recorded. Binary values,
+    such as overlap geometries, are only described."""
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return "<{} bytes>".format(len(value))
+    if isinstance(value, str) and len(value) > MAX_PARAMETER_LENGTH:
+        return "{}... <{} characters>".format(value[:MAX_PARAMETER_LENGTH], len(value))
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    return format_parameter(str(value))
+
+
+def format_parameters(parameters):
+    if isinstance(parameters, dict):
+        return {name: format_parameter(value) for name, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [format_parameter(value) for value in parameters]
+    return parameters
+
+
+def explain(cursor, statement, parameters):
+    """Returns the text of the analyzed plan of a statement, run on the
+    connection of the cursor that ran it"""
+    explain_cursor = cursor.connection.cursor()
+    try:
+        # a failed EXPLAIN mustn't abort the request's transaction
+        explain_cursor.execute("SAVEPOINT scip_explain")
+        try:
+            explain_cursor.execute(
+                "EXPLAIN (ANALYZE, BUFFERS) " + statement, parameters
+            )
+            plan = "\n".join(line for (line,) in explain_cursor.fetchall())
+        except Exception as e:
+            explain_cursor.execute("ROLLBACK TO SAVEPOINT scip_explain")
+            plan = "EXPLAIN failed: {}".format(e)
+        explain_cursor.execute("RELEASE SAVEPOINT scip_explain")
+        return plan
+    except Exception as e:
+        return "EXPLAIN failed: {}".format(e)
+    finally:
+        explain_cursor.close()
+
+
+class SlowQueryLog:
+    """Records the statements run by an engine that take longer than
+    threshold seconds, keeping the most recent size of them, and explaining
+    a fraction explain_rate of them"""
+
+    def __init__(self, threshold, explain_rate=0.1, size=100):
+        self.threshold = threshold
+        self.explain_rate = explain_rate
+        self.entries = deque(maxlen=size)
+        self.lock = threading.Lock()
+
+    def attach(self, engine):
+        event.listen(engine, "before_cursor_execute", self.before_execute)
+        event.listen(engine, "after_cursor_execute", self.after_execute)
+
+    def detach(self, engine):
+        event.remove(engine, "before_cursor_execute", self.before_execute)
+        event.remove(engine, "after_cursor_execute", self.after_execute)
+
+    # the start time is kept on the statement's execution context, which is
+    # discarded with it, even if the statement fails
+    def before_execute(self, conn, cursor, statement, parameters, context, many):
+        if context is not None:
+            context.scip_query_start = perf_counter()
+
+    def after_execute(self, conn, cursor, statement, parameters, context, many):
+        start = getattr(context, "scip_query_start", None)
+        if start is None:
+            return
+        seconds = perf_counter() - start
+        if seconds < self.threshold:
+            return
+
+        plan = None
+        if (
+            not many
+            and statement.lstrip()[:6].upper() == "SELECT"
+            and random.random() < self.explain_rate
+        ):
+            plan = explain(cursor, statement, parameters)
+
+        entry = {
+            "time": datetime.now(timezone.utc).isoformat(),
+            "duration_ms": seconds * 1000,
+            "request": request.path if has_request_context() else None,
+            "statement": statement,
+            "parameters": format_parameters(parameters),
+            "plan": plan,
+        }
+        with self.lock:
+            self.entries.append(entry)
+
+    def recent(self):
+        """Returns the recorded slow queries, newest first"""
+        with self.lock:
+            return list(reversed(self.entries))
+
+
+# the SlowQueryLog of the app's engine, if slow queries are recorded
+slow_query_log = None
+
+
+def enable_slow_query_log(engine):
+    """Starts recording the engine's slow queries, if configured to"""
+    global slow_query_log
+    slow_query_log = None
+    threshold = slow_query_threshold()
+    if threshold is None:
+        return
+    slow_query_log = SlowQueryLog(
+        threshold,
+        float(os.getenv("SCIP_SLOW_QUERY_EXPLAIN_RATE", 0.1)),
+        int(os.getenv("SCIP_SLOW_QUERY_BUFFER", 100)),
+    )
+    slow_query_log.attach(engine)
+
+
+def admin_authorized(request):
+    """Whether a request may use the admin endpoints. None may if no admin
+    token is set."""
+    token = os.getenv("SCIP_ADMIN_TOKEN")
+    if not token:
+        return False
+    return hmac.compare_digest(
+        request.headers.get("Authorization", ""), "Bearer {}".format(token)
+    )
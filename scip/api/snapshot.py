@@ -0,0 +1,85 @@
+"""
+The data behind the API only changes when new data is loaded, and most
+requests don't have an overlap, so their possible parameters can be listed
+ahead of time. `flask snapshot DIRECTORY` renders the response to each such
+request into a gzipped file in a directory, with a manifest listing them
+(see snapshot_export.py).
+
+When SCIP_SNAPSHOT_DIR is set to a snapshot directory, requests listed in
+its manifest are answered by reading the file, without running any queries.
+Requests are matched after the same normalization as the response cache, so
+`kind=Watershed` is answered by the snapshot of `kind=watershed`. Other
+requests are answered as usual. The snapshot is reread whenever its
+manifest changes, so a new snapshot can be exported while the API is
+running; it should be exported again after every data load.
+"""
+
+import gzip
+import os
+import threading
+from collections import namedtuple
+from json import load
+from werkzeug.wrappers import Response
+from scip.api.response_cache import cache_key
+from scip.api.compression import negotiate, encoded_response
+
+MANIFEST = "manifest.json"
+
+# path: the path of the gzipped response
+# etag: the entity tag of the uncompressed response
+SnapshotEntry = namedtuple("SnapshotEntry", ["path", "etag"])
+
+
+class Snapshot:
+    def __init__(self, directory, mtime):
+        self.mtime = mtime
+        with open(os.path.join(directory, MANIFEST)) as f:
+            manifest = load(f)
+        self.entries = {
+            cache_key(response["request_type"], response["params"]): SnapshotEntry(
+                os.path.join(directory, response["file"]), response["etag"]
+            )
+            for response in manifest["responses"]
+        }
+
+
+_snapshots = {}
+_lock = threading.Lock()
+
+
+def current_snapshot():
+    """Returns the Snapshot in SCIP_SNAPSHOT_DIR, or None"""
+    directory = os.getenv("SCIP_SNAPSHOT_DIR")
+    if not directory:
+        return None
+    try:
+        mtime = os.stat(os.path.join(directory, MANIFEST)).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+    with _lock:
+        snapshot = _snapshots.get(directory)
+        if snapshot is None or snapshot.mtime != mtime:
+            snapshot = _snapshots[directory] = Snapshot(directory, mtime)
+    return snapshot
+
+
+def snapshot_entry(request_type, params):
+    """Returns the SnapshotEntry for a request, or None if it isn't in the
+    current snapshot"""
+    snapshot = current_snapshot()
+    if snapshot is None:
+        return None
+    return snapshot.entries.get(cache_key(request_type, params))
+
+
+def snapshot_response(entry, request):
+    """Returns a response with the contents of a snapshot file, still
+    compressed if the client accepts gzip"""
+    with open(entry.path, "rb") as f:
+        encodings = {"gzip": f.read()}
+    body = None
+    if negotiate(request, encodings) is None:
+        body = gzip.decompress(encodings["gzip"])
+    resp = Response(content_type="application/json")
+    return encoded_response(resp, request, body, entry.etag, encodings)
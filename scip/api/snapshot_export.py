@@ -0,0 +1,87 @@
+"""
+Exports a snapshot of the API's responses to every request without an
+overlap: the taxon list, and the regions and populations of each kind,
+species, subgroup and name, with the default format and fields. The
+snapshot is served as described in snapshot.py.
+"""
+
+import gzip
+import os
+import tempfile
+from datetime import datetime, timezone
+from json import dumps
+from salmon_occurrence import Region, ConservationUnit
+from sqlalchemy_sqlschema import maintain_schema
+from scip.api import methods, response_body
+from scip.api.response_cache import etag
+from scip.api.snapshot import MANIFEST
+from scip.api.vocabulary import vocabulary
+
+
+def snapshot_requests(session):
+    """Yields (request type, parameters) for every request in a snapshot"""
+    vocab = vocabulary(session)
+    species = [{}]
+    for common_name in vocab.common_names:
+        species.append({"common_name": common_name})
+        for subgroup in sorted(s for s in vocab.subgroups[common_name] if s):
+            species.append({"common_name": common_name, "subgroup": subgroup})
+
+    with maintain_schema("public, salmon_geometry", session):
+        region_names = session.query(Region.kind, Region.name).distinct().all()
+        cu_names = session.query(ConservationUnit.name).distinct().all()
+
+    yield "taxon", {}
+    for kind in vocab.region_kinds + ["conservation_unit"]:
+        for params in species:
+            yield "region", dict(params, kind=kind)
+    for kind, name in sorted(region_names):
+        yield "region", {"kind": kind, "name": name}
+    for (name,) in sorted(cu_names):
+        yield "region", {"kind": "conservation_unit", "name": name}
+
+    for params in species:
+        yield "population", params
+    for (name,) in sorted(cu_names):
+        yield "population", {"name": name}
+
+
+def write_atomically(path, data):
+    # files are replaced, rather than overwritten, so that a running API
+    # never reads a partly written file.
+    fd, temporary = tempfile.mkstemp(dir=os.path.dirname(path))
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.chmod(temporary, 0o644)
+    os.replace(temporary, path)
+
+
+def export_snapshot(session, directory):
+    """Renders every snapshot request into directory, and writes its
+    manifest. Returns the number of responses written."""
+    os.makedirs(directory, exist_ok=True)
+    responses = []
+    for request_type, params in snapshot_requests(session):
+        body = response_body(methods[request_type](session, **params))
+        tag = etag(body)
+        filename = "{}.json.gz".format(tag)
+        write_atomically(
+            os.path.join(directory, filename), gzip.compress(body, mtime=0)
+        )
+        responses.append(
+            {
+                "request_type": request_type,
+                "params": params,
+                "file": filename,
+                "etag": tag,
+            }
+        )
+
+    # the manifest is written last, so the API switches to the new
+    # snapshot only once all its files are present.
+    manifest = {
+        "created": datetime.now(timezone.utc).isoformat(),
+        "responses": responses,
+    }
+    write_atomically(os.path.join(directory, MANIFEST), dumps(manifest).encode())
+    return len(responses)
@@ -0,0 +1,24 @@
+"""
+SQLAlchemy compiles each statement to SQL once and keeps the result in the
+engine's compiled cache, keyed by the statement's structure, so the queries
+built for every request only pay for compilation the first time a given
+combination of parameters is seen. Values, including overlap geometries, are
+always bound parameters, so they don't affect the key.
+
+GeoAlchemy2 0.13 declares its column types uncacheable, which silently
+disables the compiled cache for every statement that touches a geometry
+column - nearly all of this service's queries. The types' cache keys are
+built from their constructor arguments, which are all plain hashable values
+(geometry type, SRID, dimension, and so on), so it is safe to allow caching
+them; cache_geometry_types() does so.
+
+The size of the compiled cache is set by SQLALCHEMY_QUERY_CACHE_SIZE (see
+scip._build_engine_options).
+"""
+
+from geoalchemy2.types import Geography, Geometry, Raster
+
+
+def cache_geometry_types():
+    for geometry_type in (Geometry, Geography, Raster):
+        geometry_type.cache_ok = True
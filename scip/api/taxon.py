@@ -1,6 +1,9 @@
 from salmon_occurrence import Taxon
+from scip.api.parameters import endpoint
+from scip.api.memory_engine import memory_store
 
 
+@endpoint()
 def taxon(session):
     """Very simple API with no parameters. Returns a list of all salmon taxons in the
     database.
@@ -10,13 +13,16 @@ def taxon(session):
     :return: a list of objects representing salmon taxons in the database. A taxon has
         a scientific name, a common name, and optionall a subgroup.
     """
-    q = session.query(
-        Taxon.common_name.label("common_name"),
-        Taxon.scientific_name.label("scientific_name"),
-        Taxon.subgroup.label("subgroup"),
-    )
-
-    results = q.all()
+    store = memory_store(session)
+    if store:
+        results = store.taxons
+    else:
+        q = session.query(
+            Taxon.common_name.label("common_name"),
+            Taxon.scientific_name.label("scientific_name"),
+            Taxon.subgroup.label("subgroup"),
+        )
+        results = q.all()
 
     result_list = [
         {
@@ -0,0 +1,120 @@
+"""
+Mapbox Vector Tiles of region or conservation unit boundaries, for
+displaying every region of a kind on a map without sending full-resolution
+polygons to the browser. Tiles are built by PostGIS, which clips each
+boundary to the tile and quantizes it to the tile's grid, and are cached.
+
+Tiles are addressed by the usual web map z/x/y scheme in the Web Mercator
+projection. Each tile has a single layer, named after the kind of region,
+whose features have the region's `name`, `code` and `kind` as attributes.
+"""
+
+import os
+from sqlalchemy import func, select
+from sqlalchemy_sqlschema import maintain_schema
+from salmon_occurrence import Region, ConservationUnit
+from scip.api.cache import LRUCache
+from scip.api.parameters import (
+    endpoint,
+    RegionKind,
+    CommonName,
+    Subgroup,
+    TileIndex,
+    Zoom,
+)
+from scip.api.projection import DATABASE_SRID
+from scip.api.region_helpers import build_cu_query, build_region_query
+
+WEB_MERCATOR = 3857
+
+# size of a tile's grid, and of the margin of geometry kept around it so
+# boundaries don't show seams between tiles, in grid units
+TILE_EXTENT = 4096
+TILE_BUFFER = 64
+
+# width of the whole Web Mercator map, in metres
+WORLD_SIZE = 40075016.68557849
+
+# the area, in EPSG 4326, in which the database's projection is used to find
+# the regions in a tile - generously around BC, since far outside it the
+# projection distorts shapes beyond use
+PROJECTED_AREA = (-180, 20, -80, 85)
+# the longest edge, in degrees, of a tile's area when it is reprojected, so
+# that its edges curve as they should in the database's projection
+SEGMENT_DEGREES = 0.5
+
+# empty tiles are counted as a small size so that they are also bounded
+tile_cache = LRUCache(
+    int(os.getenv("SCIP_TILE_CACHE_BYTES", 64 * 1024 * 1024)),
+    sizeof=lambda tile: max(len(tile), 64),
+)
+
+
+@endpoint(
+    RegionKind(required=True),
+    Zoom("z", required=True),
+    TileIndex("x", "Tile column", required=True),
+    TileIndex("y", "Tile row", required=True),
+    CommonName(),
+    Subgroup("subgroup"),
+)
+def tile(session, kind, z, x, y, common_name=None, subgroup=None):
+    """Return a Mapbox Vector Tile of the regions of a kind.
+
+    :param session: (sqlalchemy.orm.session.Session) a database Session object
+    :param kind: the type of region, such as `watershed`, `basin` or `conservation_unit`
+    :param z: the tile's zoom level
+    :param x: the tile's column
+    :param y: the tile's row
+    :param common_name: a salmon species; only regions where it is found are included
+    :param subgroup: a species subtype
+
+    :return: the tile, as bytes
+    """
+    key = (kind, z, x, y, common_name, subgroup)
+    cached = tile_cache.get(key)
+    if cached is not None:
+        return cached
+
+    envelope = func.ST_TileEnvelope(z, x, y)
+    # the area covered by the tile, with its margin, in the database's
+    # projection, so that the spatial index can be used to find regions.
+    # A Web Mercator tile is a rectangle in EPSG 4326 too, but its edges are
+    # curves in the database's projection, so it is segmentized before it is
+    # reprojected; otherwise low zoom tiles, which span much of the world,
+    # would miss regions they cover.
+    margin = WORLD_SIZE / 2**z * TILE_BUFFER / TILE_EXTENT
+    area = func.ST_Intersection(
+        func.ST_Transform(func.ST_Expand(envelope, margin), 4326),
+        func.ST_MakeEnvelope(*PROJECTED_AREA, 4326),
+    )
+    bounds = func.ST_Transform(func.ST_Segmentize(area, SEGMENT_DEGREES), DATABASE_SRID)
+
+    fields = ["name", "code", "kind"]
+    with maintain_schema("public, salmon_geometry", session):
+        if kind == "conservation_unit":
+            model = ConservationUnit
+            q = build_cu_query(
+                session, common_name=common_name, subgroup=subgroup, fields=fields
+            )
+        else:
+            model = Region
+            q = build_region_query(
+                session, kind, common_name=common_name, subgroup=subgroup, fields=fields
+            )
+
+        q = q.filter(model.boundary.op("&&", is_comparison=True)(bounds))
+        q = q.add_columns(
+            func.ST_AsMVTGeom(
+                func.ST_Transform(model.boundary, WEB_MERCATOR),
+                envelope,
+                TILE_EXTENT,
+                TILE_BUFFER,
+            ).label("geom")
+        )
+        features = q.subquery("features")
+        mvt = func.ST_AsMVT(features.table_valued(), kind, TILE_EXTENT, "geom", "id")
+        rv = bytes(session.execute(select(mvt).select_from(features)).scalar() or b"")
+
+    tile_cache.put(key, rv)
+    return rv
@@ -0,0 +1,221 @@
+"""
+Records how long each phase of a request takes - parsing parameters,
+querying the database, formatting rows, serializing and compressing the
+response - and how many rows it returned, so slow requests can be
+explained.
+
+The phases of each request are sent back in its Server-Timing header, which
+browsers' developer tools display, and are aggregated, along with response
+times and sizes, into histograms served from /api/metrics in the Prometheus
+text format. Each worker process keeps its own metrics.
+
+Phases are timed with the phase() context manager, and do nothing outside a
+request, such as in commands, tests that call endpoints directly, or the
+worker threads of a batch request.
+"""
+
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from time import perf_counter
+from flask import g, has_request_context
+
+# upper bounds of the histograms' buckets
+SECONDS_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10]
+BYTES_BUCKETS = [1e3, 1e4, 1e5, 1e6, 1e7, 1e8]
+ROWS_BUCKETS = [1, 10, 100, 1000, 10000, 100000]
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _format_labels(names, values):
+    if not names:
+        return ""
+    return "{{{}}}".format(
+        ",".join('{}="{}"'.format(name, value) for name, value in zip(names, values))
+    )
+
+
+def _format_number(value):
+    return repr(float(value)) if value != float("inf") else "+Inf"
+
+
+class Counter:
+    def __init__(self, name, description, labels=()):
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, *labels):
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0) + 1
+
+    def render(self):
+        yield "# HELP {} {}".format(self.name, self.description)
+        yield "# TYPE {} counter".format(self.name)
+        with self.lock:
+            values = sorted(self.values.items())
+        for labels, value in values:
+            yield "{}{} {}".format(
+                self.name, _format_labels(self.labels, labels), value
+            )
+
+
+class Histogram:
+    def __init__(self, name, description, buckets, labels=()):
+        self.name = name
+        self.description = description
+        self.buckets = buckets
+        self.labels = labels
+        # labels: (bucket counts, sum, count)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        with self.lock:
+            counts, total, count = self.values.get(
+                labels, ([0] * (len(self.buckets) + 1), 0, 0)
+            )
+            counts[bisect_left(self.buckets, value)] += 1
+            self.values[labels] = (counts, total + value, count + 1)
+
+    def render(self):
+        yield "# HELP {} {}".format(self.name, self.description)
+        yield "# TYPE {} histogram".format(self.name)
+        with self.lock:
+            values = sorted(
+                (labels, (list(counts), total, count))
+                for labels, (counts, total, count) in self.values.items()
+            )
+        names = self.labels + ("le",)
+        for labels, (counts, total, count) in values:
+            cumulative = 0
+            for bound, bucket in zip(self.buckets + [float("inf")], counts):
+                cumulative += bucket
+                yield "{}_bucket{} {}".format(
+                    self.name,
+                    _format_labels(names, labels + (_format_number(bound),)),
+                    cumulative,
+                )
+            yield "{}_sum{} {}".format(
+                self.name, _format_labels(self.labels, labels), repr(float(total))
+            )
+            yield "{}_count{} {}".format(
+                self.name, _format_labels(self.labels, labels), count
+            )
+
+
+requests_total = Counter(
+    "scip_requests_total", "Requests answered.", ("endpoint", "status")
+)
+request_seconds = Histogram(
+    "scip_request_duration_seconds",
+    "Time taken to answer requests.",
+    SECONDS_BUCKETS,
+    ("endpoint",),
+)
+phase_seconds = Histogram(
+    "scip_request_phase_duration_seconds",
+    "Time taken by each phase of answering requests.",
+    SECONDS_BUCKETS,
+    ("endpoint", "phase"),
+)
+response_bytes = Histogram(
+    "scip_response_size_bytes",
+    "Size of response bodies, as sent.",
+    BYTES_BUCKETS,
+    ("endpoint",),
+)
+response_rows = Histogram(
+    "scip_response_rows", "Rows returned by requests.", ROWS_BUCKETS, ("endpoint",)
+)
+
+metrics = [
+    requests_total,
+    request_seconds,
+    phase_seconds,
+    response_bytes,
+    response_rows,
+]
+
+
+def render_metrics():
+    """Returns all the metrics in the Prometheus text format"""
+    return "".join(
+        "{}\n".format(line) for metric in metrics for line in metric.render()
+    )
+
+
+class RequestTiming:
+    def __init__(self):
+        self.start = perf_counter()
+        # phase name: seconds, in the order the phases first ran
+        self.phases = {}
+        self.rows = None
+
+    def add(self, name, seconds):
+        self.phases[name] = self.phases.get(name, 0) + seconds
+
+
+def current_timing():
+    """Returns the RequestTiming of the current request, or None outside
+    a request"""
+    if not has_request_context():
+        return None
+    return g.get("scip_timing")
+
+
+@contextmanager
+def phase(name):
+    """Times the enclosed block as part of the named phase of the current
+    request. Blocks in the same phase are added together."""
+    timing = current_timing()
+    if timing is None:
+        yield
+        return
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        timing.add(name, perf_counter() - start)
+
+
+def record_rows(count):
+    """Records that the current request returned count rows"""
+    timing = current_timing()
+    if timing is not None:
+        timing.rows = (timing.rows or 0) + count
+
+
+def start_request():
+    g.scip_timing = RequestTiming()
+
+
+def finish_request(response, endpoint):
+    """Adds the current request's Server-Timing header to response, and
+    records its metrics under the endpoint's name"""
+    timing = current_timing()
+    if timing is None:
+        return
+    total = perf_counter() - timing.start
+
+    entries = [
+        "{};dur={:.2f}".format(name, seconds * 1000)
+        for name, seconds in timing.phases.items()
+    ]
+    entries.append("total;dur={:.2f}".format(total * 1000))
+    if timing.rows is not None:
+        entries.append("rows;desc={}".format(timing.rows))
+    response.headers["Server-Timing"] = ", ".join(entries)
+
+    requests_total.inc(endpoint, str(response.status_code))
+    request_seconds.observe(total, endpoint)
+    for name, seconds in timing.phases.items():
+        phase_seconds.observe(seconds, endpoint, name)
+    # streamed responses have no length until they are sent
+    if response.content_length is not None:
+        response_bytes.observe(response.content_length, endpoint)
+    if timing.rows is not None:
+        response_rows.observe(timing.rows, endpoint)
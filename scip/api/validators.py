@@ -1,22 +1,14 @@
 # helper functions used to validate request parameters
 import re
-from salmon_occurrence import Region, ConservationUnit, Taxon
-from sqlalchemy import func
-from scip.api.taxon import taxon
-
-
-def database_column_values(session, column):
-    # returns a list for containing every value present in a specific
-    # column in the database. Used to see if a user-supplied parameter
-    # exists in the database.
-    q = session.query(column).distinct().all()
-    return list(map(lambda x: x[0], q))
+from scip.api.vocabulary import vocabulary
 
 
+# the following validators check parameters against the cached
+# vocabulary of the database (see vocabulary.py) rather than
+# querying the database directly.
 def parse_region_kind(session, kind):
     k = kind.lower()
-    kinds = database_column_values(session, Region.kind)
-    kinds.append("conservation_unit")
+    kinds = vocabulary(session).region_kinds + ["conservation_unit"]
     if k in kinds:
         return k
     else:
@@ -26,7 +18,7 @@ def parse_region_kind(session, kind):
 
 
 def parse_common_name(session, cn):
-    species = database_column_values(session, Taxon.common_name)
+    species = vocabulary(session).common_names
     s = cn.lower().capitalize()
     if s in species:
         return s
@@ -37,16 +29,12 @@ def parse_common_name(session, cn):
 
 
 def parse_subgroup(session, species, subgroup):
-    taxons = taxon(session)
+    subgroups = vocabulary(session).subgroups
 
     sp = species.lower().capitalize()
     sg = subgroup.lower().capitalize()
 
-    found = list(
-        filter(lambda t: t["common_name"] == sp and t["subgroup"] == sg, taxons)
-    )
-
-    if len(found) > 0:
+    if sg in subgroups.get(sp, set()):
         return sg
     elif parse_common_name(session, sp):
         raise ValueError("Unknown subgroup of species {}: {}".format(sp, sg))
@@ -54,6 +42,32 @@ def parse_subgroup(session, species, subgroup):
         raise ValueError("Unknown salmon species {}".format(species))
 
 
+def parse_boolean(value):
+    if isinstance(value, bool):
+        return value
+    v = value.lower()
+    if v in {"1", "true", "yes"}:
+        return True
+    elif v in {"", "0", "false", "no"}:
+        return False
+    else:
+        raise ValueError("Expected true or false: {}".format(value))
+
+
+def parse_fields(fields, allowed):
+    # accepts a comma separated string or a list; returns the requested
+    # fields in the order they appear in allowed
+    if isinstance(fields, str):
+        fields = fields.split(",")
+    requested = {f.strip().lower() for f in fields}
+    unknown = requested.difference(allowed)
+    if unknown:
+        raise ValueError(
+            "Unknown fields: {}. Available fields: {}".format(sorted(unknown), allowed)
+        )
+    return [f for f in allowed if f in requested]
+
+
 # This code has been taken out of use following the discovery that the
 # front end sometimes passes geoJSON, which - absent WKT verification code -
 # was not previously noticed. TODO: fix the front end, then return this check
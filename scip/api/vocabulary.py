@@ -0,0 +1,40 @@
+"""
+The region kinds, salmon species, and subgroups present in the database
+are used to validate nearly every request, but only change when new data is
+loaded. They are read from the database together, once, and kept in a
+BindCache so validation doesn't cost any database round trips.
+"""
+
+from collections import namedtuple
+from salmon_occurrence import Region, Taxon
+from sqlalchemy_sqlschema import maintain_schema
+from scip.api.cache import BindCache
+
+# region_kinds: list of the kinds of region in the Region table
+# common_names: list of the salmon species in the Taxon table
+# subgroups: dictionary mapping each species to a set of its subgroups
+Vocabulary = namedtuple("Vocabulary", ["region_kinds", "common_names", "subgroups"])
+
+
+def load_vocabulary(session):
+    with maintain_schema("public, salmon_geometry", session):
+        kinds = session.query(Region.kind).distinct().all()
+        taxons = session.query(Taxon.common_name, Taxon.subgroup).distinct().all()
+
+    subgroups = {}
+    for common_name, subgroup in taxons:
+        subgroups.setdefault(common_name, set()).add(subgroup)
+
+    return Vocabulary(
+        region_kinds=sorted(k[0] for k in kinds),
+        common_names=sorted(subgroups.keys()),
+        subgroups=subgroups,
+    )
+
+
+_vocabulary = BindCache(load_vocabulary)
+
+
+def vocabulary(session):
+    """Returns the (possibly cached) Vocabulary of the session's database"""
+    return _vocabulary.get(session)
@@ -0,0 +1,32 @@
+import click
+
+from scip.api.geometry_store import refresh_geometry_store, drop_geometry_store
+from scip.api.region_taxon import refresh_region_taxon, drop_region_taxon
+from scip.api.snapshot_export import export_snapshot
+
+
+def add_commands(app, db):
+    @app.cli.command("precompute")
+    @click.option(
+        "--drop", is_flag=True, help="Remove precomputed data instead of building it."
+    )
+    def precompute(drop):
+        """Build or refresh precomputed data derived from the salmon database.
+        Should be run after new data is loaded. Requires a database user
+        permitted to create materialized views."""
+        if drop:
+            drop_geometry_store(db.session)
+            drop_region_taxon(db.session)
+        else:
+            refresh_geometry_store(db.session)
+            refresh_region_taxon(db.session)
+        db.session.commit()
+
+    @app.cli.command("snapshot")
+    @click.argument("directory")
+    def snapshot(directory):
+        """Export the responses to every request without an overlap into
+        DIRECTORY, to be served by setting SCIP_SNAPSHOT_DIR. Should be run
+        after new data is loaded."""
+        count = export_snapshot(db.session, directory)
+        click.echo("Wrote {} responses to {}".format(count, directory))
@@ -1,7 +1,20 @@
 from flask import jsonify, request
 from sqlalchemy import text
+from werkzeug.wrappers import Response
 
 import scip.api as api
+from scip.api import RequestError, error_response
+from scip.api.batch import batch
+from scip.api.compression import LazyEncodings, encoded_response
+from scip.api.response_cache import etag
+from scip.api.tiles import tile
+from scip.api.materialized_views import without_dropped_views
+from scip.api import timing
+from scip.api import slow_queries
+from scip.api.data_version import check_data_version
+
+# endpoints that aren't timed, or cached by clients
+UNTIMED = {"readyz", "metrics", "slow_query_report"}
 
 
 def add_routes(app, db):
@@ -23,13 +36,68 @@ def add_routes(app, db):
         response.cache_control.no_store = True
         return response, http_status
 
+    @app.route("/api/metrics")
+    def metrics():
+        response = Response(timing.render_metrics(), content_type=timing.CONTENT_TYPE)
+        response.cache_control.no_store = True
+        return response
+
+    @app.route("/api/admin/slow-queries")
+    def slow_query_report():
+        log = slow_queries.slow_query_log
+        if log is None:
+            return Response("Slow queries are not being recorded", status=404)
+        if not slow_queries.admin_authorized(request):
+            return Response("Not authorized", status=401)
+        response = jsonify(log.recent())
+        response.cache_control.no_store = True
+        return response
+
+    @app.route("/api/tiles/<kind>/<int:z>/<int:x>/<int:y>")
+    def tiles(kind, z, x, y):
+        args = dict(tile.schema.select(request.args), kind=kind, z=z, x=x, y=y)
+        try:
+            rv = without_dropped_views(db.session, tile, **args)
+        except ValueError as e:
+            return error_response(e)
+        return encoded(Response(content_type="application/vnd.mapbox-vector-tile"), rv)
+
+    @app.route("/api/batch", methods=["POST"])
+    def batch_request():
+        try:
+            rv = batch(db.session, request.get_json(silent=True))
+        except RequestError as e:
+            return error_response(e)
+        return encoded(Response(content_type="application/json"), rv.encode())
+
     @app.route("/api/<request_type>", methods=["GET", "POST"])
     def api_request(*args, **kwargs):
         return api.call(db.session, *args, **kwargs)
 
+    def encoded(resp, body):
+        # sent in the encoding the client prefers, compressed as it is sent
+        return encoded_response(resp, request, body, etag(body), LazyEncodings(body))
+
+    def endpoint_name():
+        if request.endpoint == "api_request":
+            request_type = request.view_args["request_type"]
+            return request_type if request_type in api.methods else "unknown"
+        return request.endpoint
+
+    @app.before_request
+    def start_timing():
+        if request.endpoint is not None and request.endpoint not in UNTIMED:
+            timing.start_request()
+
+    @app.before_request
+    def discard_stale_caches():
+        if request.endpoint is not None and request.endpoint not in UNTIMED:
+            check_data_version(db.session)
+
     @app.after_request
     def add_header(response):
-        if request.endpoint != "readyz":
+        if request.endpoint not in UNTIMED:
             response.cache_control.public = True
             response.cache_control.max_age = 86400
+            timing.finish_request(response, endpoint_name())
         return response
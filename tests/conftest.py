@@ -15,6 +15,9 @@ from sample_data import CUC1, CUC2, CUPO, CUPE, make_cu, make_population
 # import salmon_occurrence
 from salmon_occurrence import salmon_db, Region
 
+from scip import get_app
+from scip.api.cache import invalidate_all
+
 
 # create database
 @pytest.fixture()
@@ -95,3 +98,12 @@ def populated_db_session(db_populated_engine):
     yield session
     session.rollback()
     session.close()
+
+
+# a test client for the flask app, connected to the populated test database
+@pytest.fixture()
+def client(db_uri, db_populated_session, monkeypatch):
+    monkeypatch.setenv("DB", db_uri)
+    invalidate_all()
+    app = get_app()
+    yield app.test_client()
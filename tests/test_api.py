@@ -0,0 +1,216 @@
+import pytest
+import json
+import gzip
+from scip.api import compression
+from scip.api.response_cache import response_cache
+
+
+def test_call_unknown_endpoint(client):
+    response = client.get("/api/banana")
+    assert response.status_code == 400
+
+
+def test_call_missing_parameter(client):
+    response = client.get("/api/region")
+    assert response.status_code == 400
+    assert json.loads(response.data)["parameter"] == "kind"
+
+
+def test_call_invalid_parameter(client):
+    response = client.get("/api/region?kind=watershed&zoom=banana")
+    assert response.status_code == 400
+    assert response.content_type == "application/json"
+    assert json.loads(response.data)["parameter"] == "zoom"
+
+
+def test_call_returns_json(client):
+    response = client.get("/api/region?kind=watershed")
+    assert response.status_code == 200
+    assert response.content_type == "application/json"
+    assert len(json.loads(response.data)) == 3
+
+
+# responses carry a strong ETag, and a client presenting it gets
+# a 304 Not Modified with no body
+def test_conditional_get(client):
+    response = client.get("/api/population?common_name=chum")
+    etag, weak = response.get_etag()
+    assert etag and not weak
+
+    repeat = client.get(
+        "/api/population?common_name=chum", headers={"If-None-Match": etag}
+    )
+    assert repeat.status_code == 304
+    assert repeat.data == b""
+
+    other = client.get(
+        "/api/population?common_name=pink", headers={"If-None-Match": etag}
+    )
+    assert other.status_code == 200
+
+
+# requests that differ only in case or vertex order share a response
+@pytest.mark.parametrize(
+    "first,second",
+    [
+        ("kind=watershed&common_name=chum", "kind=Watershed&common_name=CHUM"),
+        (
+            "kind=basin&overlap=POLYGON((-110.94 53.04, -110.94 53.05, -110.93 53.05, -110.94 53.04))",
+            "kind=basin&overlap=POLYGON((-110.94 53.05, -110.93 53.05, -110.94 53.04, -110.94 53.05))",
+        ),
+    ],
+)
+def test_normalized_requests_match(client, first, second):
+    a = client.get("/api/region?{}".format(first))
+    b = client.get("/api/region?{}".format(second))
+    assert a.get_etag() == b.get_etag()
+    assert a.data == b.data
+
+
+def test_call_streaming(client):
+    streamed = client.get("/api/region?kind=conservation_unit&stream=true")
+    assert streamed.status_code == 200
+    assert streamed.is_streamed
+    listed = client.get("/api/region?kind=conservation_unit")
+    assert json.loads(streamed.data) == json.loads(listed.data)
+
+
+def test_call_geojson(client):
+    response = client.get("/api/population?format=geojson")
+    assert response.status_code == 200
+    collection = json.loads(response.data)
+    assert len(collection["features"]) == 4
+    assert isinstance(collection["features"][0]["geometry"], dict)
+
+
+def test_batch(client):
+    response = client.post(
+        "/api/batch",
+        json=[
+            {"request_type": "taxon"},
+            {"request_type": "region", "params": {"kind": "watershed"}},
+            {"request_type": "region", "params": {"kind": "banana"}},
+            {"request_type": "population", "params": {"common_name": "chum"}},
+            {"request_type": "banana", "params": {}},
+        ],
+    )
+    assert response.status_code == 200
+    results = json.loads(response.data)
+    assert [r["status"] for r in results] == [200, 200, 400, 200, 400]
+
+    # each result matches the response to the request made on its own
+    for result, url in [
+        (results[0], "/api/taxon"),
+        (results[1], "/api/region?kind=watershed"),
+        (results[3], "/api/population?common_name=chum"),
+    ]:
+        assert result["result"] == json.loads(client.get(url).data)
+    assert "banana" in results[2]["error"]
+
+
+# batch responses are compressed like the other endpoints
+def test_compressed_batch(client, monkeypatch):
+    monkeypatch.setattr(compression, "MIN_SIZE", 100)
+    body = [{"request_type": "region", "params": {"kind": "conservation_unit"}}]
+    plain = client.post("/api/batch", json=body)
+    compressed = client.post(
+        "/api/batch", json=body, headers={"Accept-Encoding": "gzip"}
+    )
+    assert compressed.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(compressed.data) == plain.data
+    assert plain.get_etag()[0]
+
+
+@pytest.mark.parametrize(
+    "body",
+    [
+        {"request_type": "taxon"},
+        [1, 2],
+        [{"request_type": "taxon"}] * 1000,
+        [{"request_type": ["region"], "params": {"kind": "watershed"}}],
+        [{"request_type": 5}],
+        [{"params": {}}],
+    ],
+)
+def test_bad_batch(client, body):
+    response = client.post("/api/batch", json=body)
+    assert response.status_code == 400
+
+
+# large responses are sent compressed to clients that accept it, with
+# a different entity tag for each encoding
+def test_compressed_response(client, monkeypatch):
+    monkeypatch.setattr(compression, "MIN_SIZE", 100)
+    plain = client.get("/api/region?kind=conservation_unit")
+    compressed = client.get(
+        "/api/region?kind=conservation_unit", headers={"Accept-Encoding": "gzip"}
+    )
+    assert compressed.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in compressed.headers["Vary"]
+    assert gzip.decompress(compressed.data) == plain.data
+    assert compressed.get_etag() != plain.get_etag()
+
+    repeat = client.get(
+        "/api/region?kind=conservation_unit",
+        headers={"Accept-Encoding": "gzip", "If-None-Match": compressed.get_etag()[0]},
+    )
+    assert repeat.status_code == 304
+
+
+# responses that won't be cached are compressed as they are sent, only in
+# the encoding the client prefers
+def test_uncached_response_compressed(client, monkeypatch):
+    monkeypatch.setattr(compression, "MIN_SIZE", 100)
+    monkeypatch.setattr(response_cache, "max_size", 0)
+    plain = client.get("/api/region?kind=conservation_unit")
+    compressed = client.get(
+        "/api/region?kind=conservation_unit", headers={"Accept-Encoding": "gzip"}
+    )
+    assert compressed.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(compressed.data) == plain.data
+    assert compressed.get_etag() != plain.get_etag()
+    assert "compress" in compressed.headers["Server-Timing"]
+    assert "compress" not in plain.headers["Server-Timing"]
+
+
+def test_lazy_encodings(monkeypatch):
+    monkeypatch.setattr(compression, "MIN_SIZE", 100)
+    body = b"salmon " * 100
+    encodings = compression.LazyEncodings(body)
+    assert "gzip" in encodings
+    assert encodings.variants == {}
+    assert gzip.decompress(encodings["gzip"]) == body
+    assert list(encodings.variants) == ["gzip"]
+    assert list(compression.LazyEncodings(b"salmon")) == []
+
+
+def test_small_response_not_compressed(client):
+    response = client.get(
+        "/api/region?kind=basin&fields=code", headers={"Accept-Encoding": "gzip"}
+    )
+    assert "Content-Encoding" not in response.headers
+
+
+def test_server_timing(client):
+    response = client.get("/api/region?kind=watershed")
+    entries = dict(
+        entry.split(";", 1) for entry in response.headers["Server-Timing"].split(", ")
+    )
+    assert {"parse", "query", "format", "serialize", "total"} <= set(entries)
+    assert entries["rows"] == "desc=3"
+
+
+def test_metrics(client):
+    client.get("/api/region?kind=watershed")
+    client.get("/api/banana")
+    response = client.get("/api/metrics")
+    assert response.status_code == 200
+    assert response.content_type.startswith("text/plain")
+    assert "Server-Timing" not in response.headers
+    metrics = response.data.decode()
+    assert 'scip_requests_total{endpoint="region",status="200"}' in metrics
+    assert 'scip_requests_total{endpoint="unknown",status="400"}' in metrics
+    assert (
+        'scip_request_phase_duration_seconds_count{endpoint="region",phase="query"}'
+        in metrics
+    )
@@ -0,0 +1,101 @@
+import pytest
+import threading
+import time
+from scip.api.cache import BindCache, LRUCache
+from scip.api.response_cache import cache_key
+
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = LRUCache(10)
+    cache.put("a", "aaaa")
+    cache.put("b", "bbbb")
+    assert cache.get("a") == "aaaa"
+    cache.put("c", "cccc")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "aaaa"
+    assert cache.get("c") == "cccc"
+    assert cache.size == 8
+
+
+def test_lru_cache_skips_oversized_values():
+    cache = LRUCache(3)
+    cache.put("a", "aaaa")
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_lru_cache_expiry():
+    cache = LRUCache(10, ttl=0)
+    cache.put("a", "aaaa")
+    assert cache.get("a") is None
+
+
+class FakeSession:
+    def get_bind(self):
+        return FakeSession
+
+
+# concurrent requests for a value that isn't loaded yet load it only once
+def test_bind_cache_loads_once():
+    calls = []
+
+    def loader(session):
+        calls.append(1)
+        time.sleep(0.1)
+        return len(calls)
+
+    cache = BindCache(loader, ttl=60)
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(cache.get(FakeSession())))
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert results == [1] * 8
+
+
+# while an expired value is reloaded, other threads get the expired value
+def test_bind_cache_serves_expired_value_while_loading():
+    started = threading.Event()
+    finish = threading.Event()
+    calls = []
+
+    def loader(session):
+        calls.append(1)
+        if len(calls) > 1:
+            started.set()
+            finish.wait(5)
+        return len(calls)
+
+    cache = BindCache(loader, ttl=0)
+    assert cache.get(FakeSession()) == 1
+    reload = threading.Thread(target=lambda: cache.get(FakeSession()))
+    reload.start()
+    started.wait(5)
+    assert cache.get(FakeSession()) == 1
+    finish.set()
+    reload.join()
+    assert len(calls) == 2
+
+
+@pytest.mark.parametrize(
+    "first,second,same",
+    [
+        ({"common_name": "Chum"}, {"common_name": "CHUM"}, True),
+        ({"name": "Watershed 1"}, {"name": "watershed 1"}, False),
+        ({"zoom": "07"}, {"zoom": 7}, True),
+        (
+            {"overlap": "POLYGON((0 0, 0 1, 1 1, 0 0))"},
+            {"overlap": "POLYGON((1 1, 0 0, 0 1, 1 1))"},
+            True,
+        ),
+        ({"overlap": "POINT(0 0)"}, {"overlap": "POINT(0 1)"}, False),
+    ],
+)
+def test_cache_key_normalization(first, second, same):
+    assert (cache_key("region", first) == cache_key("region", second)) == same
@@ -0,0 +1,42 @@
+import pytest
+import threading
+from sqlalchemy import text
+from scip.api.concurrent import run_concurrently, parallelism
+
+
+def test_results_in_order(db_populated_session, monkeypatch):
+    monkeypatch.setenv("SCIP_QUERY_PARALLELISM", "3")
+    tasks = [
+        lambda session, i=i: session.execute(text("SELECT {}".format(i))).scalar()
+        for i in range(10)
+    ]
+    assert run_concurrently(db_populated_session, tasks) == list(range(10))
+
+
+def test_separate_sessions(db_populated_session, monkeypatch):
+    monkeypatch.setenv("SCIP_QUERY_PARALLELISM", "2")
+    barrier = threading.Barrier(2, timeout=10)
+
+    # both tasks can only finish if they run at the same time
+    def task(session):
+        barrier.wait()
+        return session
+
+    sessions = run_concurrently(db_populated_session, [task, task])
+    assert sessions[0] is not sessions[1]
+    assert db_populated_session not in sessions
+
+
+def test_sequential(db_populated_session, monkeypatch):
+    monkeypatch.setenv("SCIP_QUERY_PARALLELISM", "1")
+    assert parallelism(db_populated_session.get_bind()) == 1
+    sessions = run_concurrently(db_populated_session, [lambda s: s, lambda s: s])
+    assert sessions == [db_populated_session, db_populated_session]
+
+
+def test_errors_raised(db_populated_session):
+    def fail(session):
+        raise ValueError("failed")
+
+    with pytest.raises(ValueError):
+        run_concurrently(db_populated_session, [lambda s: 1, fail, lambda s: 2])
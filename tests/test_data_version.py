@@ -0,0 +1,23 @@
+from scip.api.data_version import DataVersion
+from scip.api.region_taxon import refresh_region_taxon
+
+
+def test_data_version_changed(db_populated_session):
+    version = DataVersion(interval=0)
+    assert not version.changed(db_populated_session)
+    assert not version.changed(db_populated_session)
+
+    # precomputing data creates a materialized view
+    refresh_region_taxon(db_populated_session)
+    db_populated_session.commit()
+    assert version.changed(db_populated_session)
+    assert not version.changed(db_populated_session)
+
+
+def test_data_version_interval(db_populated_session):
+    version = DataVersion(interval=3600)
+    assert not version.changed(db_populated_session)
+    refresh_region_taxon(db_populated_session)
+    db_populated_session.commit()
+    # not checked again until the interval has passed
+    assert not version.changed(db_populated_session)
@@ -0,0 +1,116 @@
+import pytest
+from sqlalchemy import text
+from scip.api import region, population
+from scip.api.geometry_store import (
+    refresh_geometry_store,
+    drop_geometry_store,
+    geometry_store_available,
+    _store_tables,
+)
+from scip.api.materialized_views import (
+    drop_materialized_view,
+    existing_views,
+    without_dropped_views,
+)
+from scip.api.region_taxon import refresh_region_taxon, region_taxon
+
+# test data
+from sample_data import WAT1, WAT2, WAT3, BAS1, CUC1, CUC2, CUPO, CUPE
+from sample_data import PCH1, PCH2, PPKO, PPKE
+from sample_data import check_regions, check_populations
+
+
+def test_geometry_store_lifecycle(db_populated_session):
+    assert not geometry_store_available(db_populated_session)
+    refresh_geometry_store(db_populated_session)
+    assert geometry_store_available(db_populated_session)
+
+    # refreshing an existing store is also supported
+    refresh_geometry_store(db_populated_session)
+    assert geometry_store_available(db_populated_session)
+
+    drop_geometry_store(db_populated_session)
+    assert not geometry_store_available(db_populated_session)
+
+
+# views the service's database user can't read are treated as absent, and
+# are made readable by granting them to SCIP_READER_ROLE
+@pytest.mark.parametrize("grant", [True, False])
+def test_store_readable_by_reader_role(db_populated_session, monkeypatch, grant):
+    session = db_populated_session
+    session.execute(text("CREATE ROLE scip_reader"))
+    if grant:
+        monkeypatch.setenv("SCIP_READER_ROLE", "scip_reader")
+    else:
+        monkeypatch.delenv("SCIP_READER_ROLE", raising=False)
+    refresh_geometry_store(session)
+
+    names = [table.name for table in _store_tables()]
+    session.execute(text("SET ROLE scip_reader"))
+    assert (existing_views(session, names) == set(names)) == grant
+    session.execute(text("RESET ROLE"))
+
+
+# a server that found the views present keeps answering queries after
+# another process drops them
+def test_views_dropped_while_in_use(db_populated_session):
+    session = db_populated_session
+    refresh_geometry_store(session)
+    refresh_region_taxon(session)
+    assert geometry_store_available(session)
+    for name in [table.name for table in _store_tables()] + [region_taxon.name]:
+        drop_materialized_view(session, name)
+    session.commit()
+
+    response = without_dropped_views(
+        session, region, kind="watershed", common_name="Chum"
+    )
+    check_regions([WAT1, WAT2], response)
+    assert not geometry_store_available(session)
+
+
+# responses should be the same whether geometry is precomputed or not
+@pytest.mark.parametrize(
+    "kind,expected",
+    [
+        ("watershed", [WAT1, WAT2, WAT3]),
+        ("basin", [BAS1]),
+        ("conservation_unit", [CUC1, CUC2, CUPO, CUPE]),
+    ],
+)
+def test_region_listing_from_store(db_populated_session, kind, expected):
+    refresh_geometry_store(db_populated_session)
+    response = region(db_populated_session, kind=kind)
+    check_regions(expected, response)
+
+
+def test_region_by_species_from_store(db_populated_session):
+    refresh_geometry_store(db_populated_session)
+    response = region(db_populated_session, kind="watershed", common_name="Chum")
+    check_regions([WAT1, WAT2], response)
+
+
+def test_population_listing_from_store(db_populated_session):
+    refresh_geometry_store(db_populated_session)
+    response = population(db_populated_session)
+    check_populations([PCH1, PCH2, PPKO, PPKE], response)
+
+
+@pytest.mark.parametrize("zoom", [3, 7, 10, 18])
+def test_simplified_region_listing_from_store(db_populated_session, zoom):
+    refresh_geometry_store(db_populated_session)
+    stored = region(db_populated_session, kind="watershed", zoom=zoom)
+    drop_geometry_store(db_populated_session)
+    live = region(db_populated_session, kind="watershed", zoom=zoom)
+    assert sorted(stored, key=lambda r: r["code"]) == sorted(
+        live, key=lambda r: r["code"]
+    )
+
+
+# reduced precision is also served from the stored geometries
+@pytest.mark.parametrize("zoom", [None, 6, 18])
+def test_stored_precision_matches_live(db_populated_session, zoom):
+    live = region(db_populated_session, kind="watershed", zoom=zoom, precision=4)
+    refresh_geometry_store(db_populated_session)
+    stored = region(db_populated_session, kind="watershed", zoom=zoom, precision=4)
+    assert sorted(live, key=repr) == sorted(stored, key=repr)
@@ -0,0 +1,53 @@
+import pytest
+import shapely
+from scip.api.input_geometry import parse_geometry
+
+POLYGON = "POLYGON((-120 50, -120 51, -119 51, -120 50))"
+
+
+@pytest.mark.parametrize(
+    "encode",
+    [
+        lambda shape: shape.wkt,
+        lambda shape: shapely.to_geojson(shape),
+        lambda shape: shapely.to_wkb(shape),
+        lambda shape: shapely.to_wkb(shape, hex=True),
+        lambda shape: shapely.to_wkb(shapely.set_srid(shape, 4326), include_srid=True),
+    ],
+)
+def test_encodings(encode):
+    shape = shapely.from_wkt(POLYGON)
+    geometry = parse_geometry(encode(shape))
+    assert geometry.shape.equals(shape)
+    assert geometry.normalized == parse_geometry(POLYGON).normalized
+    assert shapely.get_srid(shapely.from_wkb(geometry.ewkb)) == 4326
+
+
+def test_equivalent_geometries_match():
+    reordered = "POLYGON((-120 51, -119 51, -120 50, -120 51))"
+    assert parse_geometry(reordered).normalized == parse_geometry(POLYGON).normalized
+
+
+def test_parsed_once():
+    assert parse_geometry(POLYGON) is parse_geometry(POLYGON)
+    assert parse_geometry(parse_geometry(POLYGON)) is parse_geometry(POLYGON)
+
+
+@pytest.mark.parametrize(
+    "bad",
+    [
+        "BANANA",
+        "POINT()",
+        "POINT EMPTY",
+        '{"type": "Banana"}',
+        "0101",
+        shapely.to_wkb(
+            shapely.set_srid(shapely.Point(2000000, 1000000), 3005),
+            include_srid=True,
+            hex=True,
+        ),
+    ],
+)
+def test_invalid_geometries(bad):
+    with pytest.raises(ValueError):
+        parse_geometry(bad)
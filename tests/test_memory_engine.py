@@ -0,0 +1,88 @@
+import pytest
+from scip.api import region, population, taxon
+from scip.api.memory_engine import memory_store
+from scip.api.results import encode_cursor
+from sample_data import BAS1, wgs84_point, wgs84_polygon
+
+# points inset from region edges, where EPSG 4326 and BC Albers agree
+POINT = wgs84_point(2000014, 1000014)
+POLYGON = wgs84_polygon(
+    "POLYGON((2000014 1000014, 2000015 1000020, 2000021 1000021, 2000020 1000015, 2000014 1000014))"
+)
+
+
+def both_engines(monkeypatch, session, func, **params):
+    """Returns the results of an API call answered by the database, and by
+    the memory engine"""
+    monkeypatch.setenv("SCIP_ENGINE", "sql")
+    sql = func(session, **params)
+    monkeypatch.setenv("SCIP_ENGINE", "memory")
+    memory = func(session, **params)
+    return sql, memory
+
+
+def same_results(sql, memory):
+    # the database doesn't return rows in a particular order
+    if isinstance(sql, dict):
+        assert sql["next"] == memory["next"]
+        sql, memory = sql["results"], memory["results"]
+    assert sorted(sql, key=repr) == sorted(memory, key=repr)
+
+
+def test_memory_engine_disabled(db_populated_session, monkeypatch):
+    monkeypatch.setenv("SCIP_ENGINE", "sql")
+    assert memory_store(db_populated_session) is None
+
+
+@pytest.mark.parametrize(
+    "params",
+    [
+        {"kind": "watershed"},
+        {"kind": "basin"},
+        {"kind": "conservation_unit"},
+        {"kind": "watershed", "overlap": POINT},
+        {"kind": "conservation_unit", "overlap": POINT},
+        {"kind": "watershed", "overlap": POLYGON},
+        {"kind": "watershed", "overlap": wgs84_polygon(BAS1["boundary"])},
+        {"kind": "watershed", "name": "Watershed 2"},
+        {"kind": "basin", "code": "BAS1"},
+        {"kind": "watershed", "common_name": "Chum"},
+        {"kind": "watershed", "common_name": "Pink", "subgroup": "Odd"},
+        {"kind": "conservation_unit", "common_name": "Pink", "subgroup": "Even"},
+        {"kind": "watershed", "fields": "code,outlet"},
+        {"kind": "watershed", "stream": "true"},
+        {"kind": "watershed", "limit": 2},
+        {"kind": "watershed", "limit": 2, "cursor": encode_cursor(1)},
+    ],
+)
+def test_region_parity(db_populated_session, monkeypatch, params):
+    same_results(*both_engines(monkeypatch, db_populated_session, region, **params))
+
+
+@pytest.mark.parametrize(
+    "params",
+    [
+        {},
+        {"common_name": "Pink"},
+        {"common_name": "Pink", "subgroup": "Odd"},
+        {"overlap": POINT},
+        {"overlap": POLYGON, "common_name": "Chum"},
+        {"fields": "common_name,code"},
+        {"limit": 3},
+    ],
+)
+def test_population_parity(db_populated_session, monkeypatch, params):
+    same_results(*both_engines(monkeypatch, db_populated_session, population, **params))
+
+
+def test_taxon_parity(db_populated_session, monkeypatch):
+    same_results(*both_engines(monkeypatch, db_populated_session, taxon))
+
+
+# options the memory engine can't answer are answered by the database
+@pytest.mark.parametrize(
+    "params", [{"kind": "watershed", "zoom": 6}, {"kind": "basin", "format": "geojson"}]
+)
+def test_database_fallback(db_populated_session, monkeypatch, params):
+    sql, memory = both_engines(monkeypatch, db_populated_session, region, **params)
+    assert sql == memory
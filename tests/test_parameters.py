@@ -0,0 +1,103 @@
+import pytest
+from scip.api.parameters import (
+    endpoint,
+    ParameterError,
+    String,
+    Boolean,
+    Choice,
+    List,
+    Zoom,
+    Limit,
+    Cursor,
+    Subgroup,
+    RegionKind,
+)
+from scip.api.results import encode_cursor
+
+
+@endpoint(
+    String("name", required=True),
+    Zoom(),
+    Boolean("stream"),
+    Choice("format", ["json", "geojson"], default="json"),
+    List("fields", ["a", "b", "c"]),
+    Limit(),
+    Cursor("cursor"),
+)
+def echo(session, name, zoom=None, stream=False, format="json", fields=None, **kw):
+    return dict(name=name, zoom=zoom, stream=stream, format=format, fields=fields)
+
+
+def test_defaults():
+    assert echo(None, name="x") == {
+        "name": "x",
+        "zoom": None,
+        "stream": False,
+        "format": "json",
+        "fields": ["a", "b", "c"],
+    }
+
+
+def test_conversion():
+    assert echo(
+        None, name="x", zoom="4", stream="true", format="GeoJSON", fields="c,a"
+    ) == {
+        "name": "x",
+        "zoom": 4,
+        "stream": True,
+        "format": "geojson",
+        "fields": ["a", "c"],
+    }
+
+
+@pytest.mark.parametrize(
+    "params,parameter",
+    [
+        ({}, "name"),
+        ({"name": ""}, "name"),
+        ({"name": "x", "zoom": "banana"}, "zoom"),
+        ({"name": "x", "zoom": "25"}, "zoom"),
+        ({"name": "x", "stream": "maybe"}, "stream"),
+        ({"name": "x", "format": "xml"}, "format"),
+        ({"name": "x", "fields": "a,d"}, "fields"),
+        ({"name": "x", "limit": "0"}, "limit"),
+        ({"name": "x", "cursor": "banana"}, "cursor"),
+    ],
+)
+def test_errors(params, parameter):
+    with pytest.raises(ParameterError) as e:
+        echo(None, **params)
+    assert e.value.parameter == parameter
+
+
+def test_cursor():
+    echo(None, name="x", limit="2", cursor=encode_cursor(7))
+
+
+def test_unknown_parameter():
+    with pytest.raises(TypeError):
+        echo(None, name="x", banana="1")
+
+
+def test_select():
+    assert echo.schema.select({"name": "x", "banana": "1", "zoom": None}) == {
+        "name": "x"
+    }
+
+
+@endpoint(RegionKind(required=True), Subgroup("subgroup"))
+def kinds(session, kind, subgroup=None):
+    return kind
+
+
+def test_vocabulary(db_populated_session):
+    assert kinds(db_populated_session, kind="Watershed") == "watershed"
+    with pytest.raises(ParameterError) as e:
+        kinds(db_populated_session, kind="banana")
+    assert e.value.parameter == "kind"
+
+
+def test_subgroup_needs_species(db_populated_session):
+    with pytest.raises(ParameterError) as e:
+        kinds(db_populated_session, kind="basin", subgroup="odd")
+    assert e.value.parameter == "subgroup"
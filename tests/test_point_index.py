@@ -0,0 +1,45 @@
+import pytest
+import random
+import shapely
+from scip.api.point_index import PointIndex
+
+
+@pytest.fixture
+def shapes():
+    rng = random.Random(1)
+    shapes = [
+        shapely.Point(rng.uniform(0, 100), rng.uniform(0, 100)).buffer(
+            rng.uniform(1, 15)
+        )
+        for _ in range(50)
+    ]
+    # shapes sharing edges with each other and with grid cells
+    shapes += [
+        shapely.box(0, 0, 50, 50),
+        shapely.box(50, 0, 100, 50),
+        shapely.Polygon([(0, 0), (50, 0), (50, 50), (0, 0)]),
+        None,
+    ]
+    shapes = shapely.from_wkb(shapely.to_wkb(shapes))
+    shapely.prepare(shapes)
+    return shapes
+
+
+def expected(shapes, x, y):
+    point = shapely.Point(x, y)
+    return [i for i, shape in enumerate(shapes) if shape and shape.intersects(point)]
+
+
+@pytest.mark.parametrize("size", [1, 16, 256])
+def test_lookup_matches_intersects(shapes, size):
+    index = PointIndex(shapes, size)
+    rng = random.Random(2)
+    points = [(rng.uniform(-10, 110), rng.uniform(-10, 110)) for _ in range(2000)]
+    points += [(0, 0), (50, 0), (50, 50), (25, 25), (100, 50), (50, 25)]
+    for x, y in points:
+        assert index.lookup(x, y) == expected(shapes, x, y)
+
+
+def test_empty():
+    assert PointIndex(shapely.from_wkb([None])).lookup(0, 0) == []
+    assert PointIndex(shapely.from_wkb([])).lookup(0, 0) == []
@@ -1,4 +1,5 @@
 import pytest
+import json
 from scip.api import population
 
 # test data
@@ -93,3 +94,54 @@ def test_population_by_overlap_polygon(db_populated_session, species, expected):
     else:
         response = population(db_populated_session, common_name=species, overlap=wkt)
         check_populations(expected, response)
+
+
+def test_population_streaming(db_populated_session):
+    response = population(db_populated_session, common_name="Pink", stream=True)
+    assert not isinstance(response, list)
+    check_populations([PPKO, PPKE], list(response))
+
+
+def test_population_geojson(db_populated_session):
+    response = population(db_populated_session, common_name="Chum", format="geojson")
+    collection = json.loads(response)
+    assert collection["type"] == "FeatureCollection"
+
+    populations = []
+    for feature in collection["features"]:
+        p = feature["properties"]
+        p["conservation_unit"]["boundary"] = json.dumps(feature["geometry"])
+        populations.append(p)
+    check_populations([PCH1, PCH2], populations)
+
+
+@pytest.mark.parametrize(
+    "fields,taxon_fields,cu_fields",
+    [
+        ("common_name", ["common_name"], None),
+        ("code,subgroup", ["subgroup"], ["code"]),
+        ("boundary", [], ["boundary"]),
+    ],
+)
+def test_population_fields(db_populated_session, fields, taxon_fields, cu_fields):
+    response = population(db_populated_session, fields=fields)
+    assert len(response) == 4
+    for p in response:
+        assert [k for k in p.keys() if k != "conservation_unit"] == taxon_fields
+        if cu_fields:
+            assert list(p["conservation_unit"].keys()) == cu_fields
+        else:
+            assert "conservation_unit" not in p
+
+
+def test_population_bad_fields(db_populated_session):
+    with pytest.raises(ValueError):
+        population(db_populated_session, fields="common_name,banana")
+
+
+def test_population_pages(db_populated_session):
+    first = population(db_populated_session, limit=3)
+    assert len(first["results"]) == 3
+    second = population(db_populated_session, limit=3, cursor=first["next"])
+    assert second["next"] is None
+    check_populations([PCH1, PCH2, PPKO, PPKE], first["results"] + second["results"])
@@ -1,6 +1,12 @@
 import pytest
 import json
+import re
+import shapely
+import shapely.wkt
+from sqlalchemy import text
+from sqlalchemy_sqlschema import maintain_schema
 from scip.api import region
+from scip.api.region_helpers import build_cu_query, build_region_query
 
 # test data
 from sample_data import (
@@ -89,6 +95,18 @@ def test_region_overlap_polygon(db_populated_session):
     check_regions([WAT1, WAT2], response)
 
 
+# overlap geometries may also be geoJSON or WKB
+@pytest.mark.parametrize("encoding", ["geojson", "wkb"])
+def test_region_overlap_encodings(db_populated_session, encoding):
+    shape = shapely.wkt.loads(wgs84_polygon(BAS1["boundary"]))
+    if encoding == "geojson":
+        overlap = shapely.to_geojson(shape)
+    else:
+        overlap = shapely.to_wkb(shape, hex=True)
+    response = region(db_populated_session, kind="watershed", overlap=overlap)
+    check_regions([WAT1, WAT2], response)
+
+
 @pytest.mark.parametrize(
     "species,subgroup,kind,expected",
     [
@@ -128,3 +146,212 @@ def test_region_by_species_and_overlap(
         overlap=wgs84_polygon(boundary["boundary"]),
     )
     check_regions(expected, response)
+
+
+# the overlap filter should be able to use the spatial index on the stored
+# boundaries. The sample tables are too small for the planner to prefer an
+# index on its own, so sequential scans are disabled for this check.
+@pytest.mark.parametrize("kind", ["watershed", "conservation_unit"])
+def test_overlap_uses_spatial_index(db_populated_session, kind):
+    wkt = wgs84_point(2000005, 1000005)
+    with maintain_schema("public, salmon_geometry", db_populated_session):
+        db_populated_session.execute(text("SET enable_seqscan TO off"))
+        if kind == "conservation_unit":
+            q = build_cu_query(db_populated_session, overlap=wkt)
+        else:
+            q = build_region_query(db_populated_session, kind, overlap=wkt)
+        sql = q.statement.compile(dialect=db_populated_session.get_bind().dialect)
+        plan = (
+            db_populated_session.connection()
+            .exec_driver_sql("EXPLAIN {}".format(sql), sql.params)
+            .all()
+        )
+
+    assert any(
+        "Index Cond" in line and "boundary" in line for (line,) in plan
+    ), "Overlap query did not use a spatial index: {}".format(plan)
+
+
+# simplified boundaries are still polygons, though they may have lost vertices
+@pytest.mark.parametrize("zoom", [0, 7, 10, 18])
+@pytest.mark.parametrize(
+    "kind,expected",
+    [
+        ("watershed", [WAT1, WAT2, WAT3]),
+        ("conservation_unit", [CUC1, CUC2, CUPO, CUPE]),
+    ],
+)
+def test_region_zoom(db_populated_session, zoom, kind, expected):
+    response = region(db_populated_session, kind=kind, zoom=zoom)
+    assert sorted(r["code"] for r in response) == sorted(e["code"] for e in expected)
+    for r in response:
+        assert json.loads(r["boundary"])["type"] == "Polygon"
+
+
+@pytest.mark.parametrize("zoom", ["banana", "-1", "25"])
+def test_region_bad_zoom(db_populated_session, zoom):
+    with pytest.raises(ValueError):
+        region(db_populated_session, kind="watershed", zoom=zoom)
+
+
+@pytest.mark.parametrize(
+    "kind,expected",
+    [
+        ("watershed", [WAT1, WAT2, WAT3]),
+        ("conservation_unit", [CUC1, CUC2, CUPO, CUPE]),
+    ],
+)
+def test_region_streaming(db_populated_session, kind, expected):
+    response = region(db_populated_session, kind=kind, stream="true")
+    assert not isinstance(response, list)
+    check_regions(expected, list(response))
+
+
+@pytest.mark.parametrize(
+    "kind,species,expected",
+    [
+        ("watershed", None, [WAT1, WAT2, WAT3]),
+        ("watershed", "Chum", [WAT1, WAT2]),
+        ("conservation_unit", "Pink", [CUPO, CUPE]),
+        ("basin", "Banana", "error"),
+    ],
+)
+def test_region_geojson(db_populated_session, kind, species, expected):
+    if expected == "error":
+        with pytest.raises(ValueError):
+            region(
+                db_populated_session, kind=kind, common_name=species, format="geojson"
+            )
+        return
+
+    response = region(
+        db_populated_session, kind=kind, common_name=species, format="geojson"
+    )
+    collection = json.loads(response)
+    assert collection["type"] == "FeatureCollection"
+
+    # the geometries are embedded as objects, not strings, but otherwise
+    # match the regular output
+    regions = [
+        dict(
+            f["properties"],
+            boundary=json.dumps(f["geometry"]),
+            outlet=json.dumps(f["properties"]["outlet"]),
+        )
+        for f in collection["features"]
+    ]
+    check_regions(expected, regions)
+
+
+def test_region_geojson_empty(db_populated_session):
+    response = region(
+        db_populated_session, kind="watershed", code="BANANA", format="geojson"
+    )
+    assert json.loads(response) == {"type": "FeatureCollection", "features": []}
+
+
+@pytest.mark.parametrize(
+    "kind,fields,expected",
+    [
+        ("watershed", "name,code", ["name", "code"]),
+        ("watershed", "code, KIND", ["code", "kind"]),
+        ("conservation_unit", "kind", ["kind"]),
+        ("conservation_unit", "outlet,name", ["name", "outlet"]),
+        ("basin", "name,banana", "error"),
+    ],
+)
+def test_region_fields(db_populated_session, kind, fields, expected):
+    if expected == "error":
+        with pytest.raises(ValueError):
+            region(db_populated_session, kind=kind, fields=fields)
+        return
+
+    response = region(db_populated_session, kind=kind, fields=fields)
+    full = region(db_populated_session, kind=kind)
+    assert len(response) == len(full)
+    for r in response:
+        assert list(r.keys()) == expected
+    if "kind" in expected:
+        assert all(r["kind"] == kind for r in response)
+
+
+def test_region_fields_by_species(db_populated_session):
+    response = region(
+        db_populated_session, kind="watershed", common_name="Chum", fields="code"
+    )
+    assert sorted(r["code"] for r in response) == ["WAT1", "WAT2"]
+
+
+@pytest.mark.parametrize(
+    "kind,species,expected",
+    [
+        ("watershed", None, [WAT1, WAT2, WAT3]),
+        ("conservation_unit", None, [CUC1, CUC2, CUPO, CUPE]),
+        ("watershed", "Pink", [WAT1, WAT2, WAT3]),
+    ],
+)
+@pytest.mark.parametrize("limit", [1, 2, 10])
+def test_region_pages(db_populated_session, kind, species, expected, limit):
+    regions = []
+    cursor = None
+    while True:
+        page = region(
+            db_populated_session,
+            kind=kind,
+            common_name=species,
+            limit=limit,
+            cursor=cursor,
+        )
+        assert len(page["results"]) <= limit
+        regions += page["results"]
+        cursor = page["next"]
+        if not cursor:
+            break
+    check_regions(expected, regions)
+
+
+def test_region_geojson_pages(db_populated_session):
+    codes = []
+    cursor = None
+    while True:
+        page = json.loads(
+            region(
+                db_populated_session,
+                kind="conservation_unit",
+                format="geojson",
+                limit=3,
+                cursor=cursor,
+            )
+        )
+        codes += [f["properties"]["code"] for f in page["features"]]
+        cursor = page["next"]
+        if not cursor:
+            break
+    assert sorted(codes) == ["CUC1", "CUC2", "CUPE", "CUPO"]
+
+
+@pytest.mark.parametrize(
+    "limit,cursor", [("0", None), ("banana", None), (None, "Mg=="), ("2", "banana")]
+)
+def test_region_bad_pages(db_populated_session, limit, cursor):
+    with pytest.raises(ValueError):
+        region(db_populated_session, kind="watershed", limit=limit, cursor=cursor)
+
+
+@pytest.mark.parametrize("precision", [2, 5])
+@pytest.mark.parametrize("zoom", [None, 6])
+def test_region_precision(db_populated_session, precision, zoom):
+    response = region(
+        db_populated_session, kind="watershed", precision=precision, zoom=zoom
+    )
+    assert len(response) == 3
+    for r in response:
+        for geometry in [r["boundary"], r["outlet"]]:
+            coordinates = re.findall(r"-?\d+\.(\d+)", geometry)
+            assert coordinates
+            assert all(len(decimals) <= precision for decimals in coordinates)
+
+
+def test_region_bad_precision(db_populated_session):
+    with pytest.raises(ValueError):
+        region(db_populated_session, kind="watershed", precision=20)
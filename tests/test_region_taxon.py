@@ -0,0 +1,63 @@
+import pytest
+from sqlalchemy import text
+from scip.api import region
+from scip.api.region_taxon import (
+    refresh_region_taxon,
+    drop_region_taxon,
+    region_taxon_available,
+)
+
+# test data
+from sample_data import WAT1, WAT2, WAT3, BAS1, check_regions, wgs84_polygon
+
+
+def test_region_taxon_lifecycle(db_populated_session):
+    assert not region_taxon_available(db_populated_session)
+    refresh_region_taxon(db_populated_session)
+    assert region_taxon_available(db_populated_session)
+    refresh_region_taxon(db_populated_session)
+    assert region_taxon_available(db_populated_session)
+    drop_region_taxon(db_populated_session)
+    assert not region_taxon_available(db_populated_session)
+
+
+# species filters look regions up by taxon, so the index must lead with it
+def test_region_taxon_index(db_populated_session):
+    refresh_region_taxon(db_populated_session)
+    definition = db_populated_session.execute(
+        text("SELECT indexdef FROM pg_indexes WHERE tablename = 'region_taxon'")
+    ).scalar()
+    assert "(taxon_id, region_id)" in definition
+
+
+# these cases match test_region_by_species; results should be the same
+# whether or not the lookup is used.
+@pytest.mark.parametrize(
+    "species,subgroup,kind,expected",
+    [
+        ("Pink", "Odd", "basin", []),
+        ("Pink", "Even", "basin", [BAS1]),
+        ("Pink", None, "watershed", [WAT1, WAT2, WAT3]),
+        ("Chum", None, "watershed", [WAT1, WAT2]),
+    ],
+)
+def test_region_by_species_from_lookup(
+    db_populated_session, species, subgroup, kind, expected
+):
+    refresh_region_taxon(db_populated_session)
+    response = region(
+        db_populated_session, kind=kind, common_name=species, subgroup=subgroup
+    )
+    check_regions(expected, response)
+
+
+def test_region_by_species_and_overlap_from_lookup(db_populated_session):
+    refresh_region_taxon(db_populated_session)
+    response = region(
+        db_populated_session,
+        kind="watershed",
+        common_name="Pink",
+        subgroup="Even",
+        overlap=wgs84_polygon(WAT1["boundary"]),
+    )
+    check_regions([WAT1, WAT2], response)
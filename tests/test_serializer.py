@@ -0,0 +1,34 @@
+import json
+import pytest
+from scip.api import serializer
+from scip.api.results import json_array
+
+
+@pytest.mark.parametrize(
+    "obj",
+    [
+        [{"name": "Watershed 1", "boundary": '{"type": "Point"}', "n": None}],
+        {"results": [], "next": "MQ=="},
+        ["é", 1.5, True],
+    ],
+)
+def test_dumps(obj):
+    assert json.loads(serializer.dumps(obj)) == obj
+
+
+def test_stdlib_serializer(monkeypatch):
+    monkeypatch.setenv("SCIP_JSON_SERIALIZER", "json")
+    dumps = serializer._select_serializer()
+    assert dumps([1, "a"]) == b'[1, "a"]'
+
+
+def test_unknown_serializer(monkeypatch):
+    monkeypatch.setenv("SCIP_JSON_SERIALIZER", "banana")
+    with pytest.raises(ValueError):
+        serializer._select_serializer()
+
+
+def test_json_array():
+    items = [{"a": 1}, {"b": [2, 3]}]
+    assert json.loads(b"".join(json_array(iter(items)))) == items
+    assert json.loads(b"".join(json_array(iter([])))) == []
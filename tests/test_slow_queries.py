@@ -0,0 +1,108 @@
+import pytest
+from sqlalchemy import text
+from scip import get_app
+from scip.api import region
+from scip.api.cache import invalidate_all
+from flask import Flask
+from scip.api.slow_queries import SlowQueryLog, admin_authorized, format_parameter
+
+
+@pytest.mark.parametrize(
+    "value,expected",
+    [
+        (5, 5),
+        ("Pink", "Pink"),
+        (None, None),
+        (b"\x01\x02\x03", "<3 bytes>"),
+        ("x" * 300, "x" * 200 + "... <300 characters>"),
+    ],
+)
+def test_format_parameter(value, expected):
+    assert format_parameter(value) == expected
+
+
+@pytest.fixture
+def slow_query_log(db_populated_session):
+    engine = db_populated_session.get_bind()
+    log = SlowQueryLog(0, explain_rate=1, size=10)
+    log.attach(engine)
+    yield log
+    log.detach(engine)
+
+
+def test_explained(db_populated_session, slow_query_log):
+    region(db_populated_session, kind="watershed", overlap="POINT(-123 49)")
+    [entry] = [
+        entry
+        for entry in slow_query_log.recent()
+        if "ST_Intersects" in entry["statement"]
+    ]
+    assert "<" in str(entry["parameters"])  # the overlap geometry isn't recorded
+    assert "Scan" in entry["plan"] and "Execution Time" in entry["plan"]
+
+    # the session is still usable after explaining its queries
+    assert db_populated_session.execute(text("SELECT 1")).scalar() == 1
+
+
+def test_ring_buffer(db_populated_session, slow_query_log):
+    for i in range(15):
+        db_populated_session.execute(text("SELECT :i"), {"i": i})
+    recent = [entry["parameters"]["i"] for entry in slow_query_log.recent()]
+    assert recent == list(range(14, 4, -1))
+
+
+def test_admin_endpoint(db_uri, db_populated_session, monkeypatch):
+    monkeypatch.setenv("DB", db_uri)
+    monkeypatch.setenv("SCIP_SLOW_QUERY_MS", "0")
+    monkeypatch.setenv("SCIP_ADMIN_TOKEN", "secret")
+    invalidate_all()
+    client = get_app().test_client()
+
+    client.get("/api/region?kind=watershed")
+    assert client.get("/api/admin/slow-queries").status_code == 401
+    response = client.get(
+        "/api/admin/slow-queries", headers={"Authorization": "Bearer secret"}
+    )
+    assert response.status_code == 200
+    assert any(entry["request"] == "/api/region" for entry in response.json)
+
+
+# without an admin token, the endpoint is disabled, whatever is sent
+@pytest.mark.parametrize(
+    "token,header,expected",
+    [
+        ("secret", "Bearer secret", True),
+        ("secret", "Bearer wrong", False),
+        ("secret", None, False),
+        (None, None, False),
+        (None, "Bearer ", False),
+        ("", "Bearer ", False),
+    ],
+)
+def test_admin_authorized(monkeypatch, token, header, expected):
+    if token is None:
+        monkeypatch.delenv("SCIP_ADMIN_TOKEN", raising=False)
+    else:
+        monkeypatch.setenv("SCIP_ADMIN_TOKEN", token)
+    headers = {"Authorization": header} if header is not None else {}
+    with Flask(__name__).test_request_context(headers=headers) as context:
+        assert admin_authorized(context.request) == expected
+
+
+def test_admin_endpoint_disabled(client):
+    assert client.get("/api/admin/slow-queries").status_code == 404
+
+
+def test_admin_endpoint_without_token(db_uri, db_populated_session, monkeypatch):
+    monkeypatch.setenv("DB", db_uri)
+    monkeypatch.setenv("SCIP_SLOW_QUERY_MS", "0")
+    monkeypatch.delenv("SCIP_ADMIN_TOKEN", raising=False)
+    invalidate_all()
+    client = get_app().test_client()
+
+    client.get("/api/region?kind=watershed")
+    assert client.get("/api/admin/slow-queries").status_code == 401
+    response = client.get(
+        "/api/admin/slow-queries", headers={"Authorization": "Bearer "}
+    )
+    assert response.status_code == 401
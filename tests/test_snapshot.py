@@ -0,0 +1,55 @@
+import gzip
+import json
+from scip.api.snapshot_export import export_snapshot, snapshot_requests
+
+
+def test_snapshot_requests(db_populated_session):
+    requests = list(snapshot_requests(db_populated_session))
+    assert ("taxon", {}) in requests
+    assert ("region", {"kind": "watershed"}) in requests
+    assert (
+        "region",
+        {"kind": "basin", "common_name": "Pink", "subgroup": "Odd"},
+    ) in requests
+    assert ("region", {"kind": "watershed", "name": "Watershed 2"}) in requests
+    assert ("population", {"common_name": "Chum"}) in requests
+    # Chum has no subgroups
+    assert not any(
+        params.get("common_name") == "Chum" and "subgroup" in params
+        for _, params in requests
+    )
+
+
+def test_export_snapshot(db_populated_session, tmp_path):
+    count = export_snapshot(db_populated_session, str(tmp_path))
+    manifest = json.loads((tmp_path / "manifest.json").read_text())
+    assert len(manifest["responses"]) == count
+    for response in manifest["responses"]:
+        assert (tmp_path / response["file"]).exists()
+
+
+# snapshot responses match the responses from the database
+def test_serve_snapshot(client, db_populated_session, tmp_path, monkeypatch):
+    export_snapshot(db_populated_session, str(tmp_path))
+    urls = [
+        "/api/taxon",
+        "/api/region?kind=watershed",
+        "/api/region?kind=Watershed&common_name=PINK&subgroup=odd",
+        "/api/population?common_name=chum",
+    ]
+    live = [client.get(url) for url in urls]
+
+    monkeypatch.setenv("SCIP_SNAPSHOT_DIR", str(tmp_path))
+    for url, expected in zip(urls, live):
+        response = client.get(url)
+        assert response.data == expected.data
+        assert response.get_etag() == expected.get_etag()
+
+        compressed = client.get(url, headers={"Accept-Encoding": "gzip"})
+        assert compressed.headers["Content-Encoding"] == "gzip"
+        assert gzip.decompress(compressed.data) == expected.data
+
+
+def test_snapshot_missing(client, tmp_path, monkeypatch):
+    monkeypatch.setenv("SCIP_SNAPSHOT_DIR", str(tmp_path / "nowhere"))
+    assert client.get("/api/region?kind=watershed").status_code == 200
@@ -0,0 +1,62 @@
+import pytest
+from sqlalchemy.pool import NullPool
+from scip import _build_engine_options
+from scip.api import region, population
+from scip.api.region_helpers import build_cu_query, build_region_query
+
+
+# whether SQLAlchemy can cache the compiled form of a statement; a statement
+# with any uncacheable element has no cache key
+def cacheable(statement):
+    return statement._generate_cache_key() is not None
+
+
+@pytest.mark.parametrize(
+    "options",
+    [
+        {},
+        {"zoom": 6},
+        {"precision": 5},
+        {"overlap": "POINT(-123 49)"},
+        {"common_name": "Pink", "subgroup": "Odd"},
+        {"fields": ["name", "code"]},
+    ],
+)
+@pytest.mark.parametrize("kind", ["watershed", "conservation_unit"])
+def test_queries_cacheable(db_populated_session, kind, options):
+    if kind == "conservation_unit":
+        q = build_cu_query(db_populated_session, **options)
+    else:
+        q = build_region_query(db_populated_session, kind, **options)
+    assert cacheable(q.statement)
+
+
+def test_compiled_once(db_populated_session):
+    compiled = db_populated_session.get_bind()._compiled_cache
+    region(db_populated_session, kind="watershed", overlap="POINT(-123 49)")
+    population(db_populated_session, common_name="Pink")
+    size = len(compiled)
+
+    # the same queries with different values reuse the compiled statements
+    region(db_populated_session, kind="watershed", overlap="POINT(-124 50)")
+    population(db_populated_session, common_name="Chum")
+    assert len(compiled) == size
+
+
+def test_engine_options(monkeypatch):
+    monkeypatch.setenv("SQLALCHEMY_QUERY_CACHE_SIZE", "1000")
+    monkeypatch.setenv("SQLALCHEMY_PREPARE_THRESHOLD", "3")
+    options = _build_engine_options("postgresql+psycopg://scip@localhost/scip")
+    assert options["query_cache_size"] == 1000
+    assert options["connect_args"] == {"prepare_threshold": 3}
+
+    monkeypatch.setenv("SQLALCHEMY_POOL_CLASS", "null")
+    options = _build_engine_options("postgresql+psycopg://scip@localhost/scip")
+    assert options["poolclass"] is NullPool
+    assert options["query_cache_size"] == 1000
+
+
+def test_prepare_needs_psycopg(monkeypatch):
+    monkeypatch.setenv("SQLALCHEMY_PREPARE_THRESHOLD", "3")
+    with pytest.raises(ValueError):
+        _build_engine_options("postgresql://scip@localhost/scip")
@@ -0,0 +1,115 @@
+import pytest
+import math
+import gzip
+from scip.api import compression
+from scip.api.tiles import tile
+
+
+# the web map tile containing a point, at a zoom level
+def tile_at(lon, lat, z):
+    n = 2**z
+    x = int((lon + 180) / 360 * n)
+    y = int((1 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2 * n)
+    return z, x, y
+
+
+# all the sample regions are close to this point
+SAMPLE_LON, SAMPLE_LAT = -110.939, 53.0466
+
+
+# attribute values are stored in the tile as plain strings, so the
+# names of the regions in a tile can be checked without decoding it.
+@pytest.mark.parametrize(
+    "kind,species,subgroup,present,absent",
+    [
+        ("watershed", None, None, ["Watershed 1", "Watershed 3"], ["Basin 1"]),
+        ("basin", None, None, ["Basin 1"], ["Watershed 1"]),
+        ("conservation_unit", "Chum", None, ["CU Chum 1"], ["CU Pink Odd"]),
+        ("watershed", "Pink", "Odd", ["Watershed 3"], ["Watershed 1"]),
+    ],
+)
+@pytest.mark.parametrize("zoom", [4, 12])
+def test_tile_contents(
+    db_populated_session, kind, species, subgroup, present, absent, zoom
+):
+    z, x, y = tile_at(SAMPLE_LON, SAMPLE_LAT, zoom)
+    rv = tile(
+        db_populated_session,
+        kind=kind,
+        z=z,
+        x=x,
+        y=y,
+        common_name=species,
+        subgroup=subgroup,
+    )
+    for name in present:
+        assert name.encode() in rv
+    for name in absent:
+        assert name.encode() not in rv
+
+
+# low zoom tiles cover much of the world, and their footprint in the
+# database's projection is far from their corners' bounding box
+@pytest.mark.parametrize("zoom", [0, 1, 2, 3, 4])
+@pytest.mark.parametrize(
+    "kind,present",
+    [
+        ("watershed", ["Watershed 1", "Watershed 2", "Watershed 3"]),
+        ("basin", ["Basin 1"]),
+        ("conservation_unit", ["CU Chum 1", "CU Chum 2", "CU Pink Odd"]),
+    ],
+)
+def test_low_zoom_tiles(db_populated_session, kind, present, zoom):
+    z, x, y = tile_at(SAMPLE_LON, SAMPLE_LAT, zoom)
+    rv = tile(db_populated_session, kind=kind, z=z, x=x, y=y)
+    for name in present:
+        assert name.encode() in rv
+
+
+def test_empty_tile(db_populated_session):
+    z, x, y = tile_at(100, -30, 8)
+    assert tile(db_populated_session, kind="watershed", z=z, x=x, y=y) == b""
+
+
+@pytest.mark.parametrize(
+    "kind,z,x,y", [("banana", 1, 0, 0), ("watershed", 25, 0, 0), ("basin", 2, 4, 0)]
+)
+def test_bad_tile(db_populated_session, kind, z, x, y):
+    with pytest.raises(ValueError):
+        tile(db_populated_session, kind=kind, z=z, x=x, y=y)
+
+
+def test_tile_route(client):
+    z, x, y = tile_at(SAMPLE_LON, SAMPLE_LAT, 10)
+    response = client.get("/api/tiles/watershed/{}/{}/{}".format(z, x, y))
+    assert response.status_code == 200
+    assert response.content_type == "application/vnd.mapbox-vector-tile"
+    assert b"Watershed 2" in response.data
+
+
+def test_compressed_tile(client, monkeypatch):
+    monkeypatch.setattr(compression, "MIN_SIZE", 10)
+    z, x, y = tile_at(SAMPLE_LON, SAMPLE_LAT, 10)
+    url = "/api/tiles/watershed/{}/{}/{}".format(z, x, y)
+    plain = client.get(url)
+    compressed = client.get(url, headers={"Accept-Encoding": "gzip"})
+    assert compressed.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(compressed.data) == plain.data
+
+
+# invalid parameters get the same structured 400 response as other endpoints
+@pytest.mark.parametrize(
+    "url,parameter",
+    [
+        ("/api/tiles/banana/4/3/5", "kind"),
+        ("/api/tiles/watershed/4/16/5", "x"),
+        ("/api/tiles/watershed/25/0/0", "z"),
+        ("/api/tiles/watershed/4/3/5?subgroup=Odd", "subgroup"),
+        ("/api/tiles/watershed/4/3/5?common_name=banana", "common_name"),
+    ],
+)
+def test_bad_tile_route(client, url, parameter):
+    response = client.get(url)
+    assert response.status_code == 400
+    assert response.content_type == "application/json"
+    assert response.json["parameter"] == parameter
@@ -0,0 +1,72 @@
+import pytest
+from flask import Flask
+from werkzeug.wrappers import Response
+from scip.api import timing
+from scip.api.timing import (
+    Counter,
+    Histogram,
+    phase,
+    record_rows,
+    start_request,
+    finish_request,
+)
+
+
+def test_histogram():
+    histogram = Histogram("test_seconds", "Test.", [0.1, 1], ("endpoint",))
+    for value in [0.05, 0.5, 0.5, 5]:
+        histogram.observe(value, "region")
+    assert list(histogram.render()) == [
+        "# HELP test_seconds Test.",
+        "# TYPE test_seconds histogram",
+        'test_seconds_bucket{endpoint="region",le="0.1"} 1',
+        'test_seconds_bucket{endpoint="region",le="1.0"} 3',
+        'test_seconds_bucket{endpoint="region",le="+Inf"} 4',
+        'test_seconds_sum{endpoint="region"} 6.05',
+        'test_seconds_count{endpoint="region"} 4',
+    ]
+
+
+def test_outside_request():
+    # timing does nothing, and doesn't fail, without a request
+    with phase("query"):
+        record_rows(10)
+
+
+# replaces the process's metrics with empty ones, so tests neither record
+# into them nor depend on what other tests recorded
+@pytest.fixture
+def fresh_metrics(monkeypatch):
+    monkeypatch.setattr(
+        timing, "requests_total", Counter("requests", "Test.", ("endpoint", "status"))
+    )
+    for name in ["request_seconds", "phase_seconds", "response_bytes", "response_rows"]:
+        old = getattr(timing, name)
+        monkeypatch.setattr(
+            timing, name, Histogram(name, "Test.", old.buckets, old.labels)
+        )
+
+
+def test_request_phases(fresh_metrics):
+    app = Flask(__name__)
+    with app.test_request_context("/api/region"):
+        start_request()
+        with phase("query"):
+            pass
+        with phase("format"):
+            record_rows(2)
+        with phase("query"):
+            record_rows(3)
+        response = Response("[]")
+        finish_request(response, "region")
+
+    names = [e.split(";")[0] for e in response.headers["Server-Timing"].split(", ")]
+    assert names == ["query", "format", "total", "rows"]
+    assert "rows;desc=5" in response.headers["Server-Timing"]
+
+    assert timing.requests_total.values == {("region", "200"): 1}
+    assert set(timing.phase_seconds.values) == {
+        ("region", "query"),
+        ("region", "format"),
+    }
+    assert timing.response_rows.values[("region",)][1:] == (5, 1)
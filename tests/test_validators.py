@@ -1,11 +1,19 @@
 import pytest
+from sqlalchemy_sqlschema import maintain_schema
+from scip.api.cache import invalidate_all
 from scip.api.validators import (
     parse_region_kind,
     parse_common_name,
     parse_subgroup,
     parse_wkt,
 )
-from sample_data import WAT1, WAT2, WAT3, BAS1
+from sample_data import WAT1, WAT2, WAT3, BAS1, make_taxon
+
+COHO = {
+    "common_name": "Coho",
+    "scientific_name": "Oncorhynchus kisutch",
+    "subgroup": "Lake",
+}
 
 
 @pytest.mark.parametrize(
@@ -94,3 +102,20 @@ def test_parsing_wkt_points(region):
 def test_parsing_invalid_wkt(bad_wkt):
     with pytest.raises(ValueError) as e:
         parse_wkt(bad_wkt)
+
+
+# the vocabulary used by the validators is cached, so data added to the
+# database isn't seen until the cache is invalidated.
+def test_vocabulary_invalidation(db_populated_session):
+    assert parse_common_name(db_populated_session, "Chum") == "Chum"
+
+    with maintain_schema("salmon_geometry, public", db_populated_session):
+        db_populated_session.add(make_taxon(**COHO))
+        db_populated_session.flush()
+
+    with pytest.raises(ValueError):
+        parse_common_name(db_populated_session, "Coho")
+
+    invalidate_all()
+    assert parse_common_name(db_populated_session, "Coho") == "Coho"
+    assert parse_subgroup(db_populated_session, "Coho", "Lake") == "Lake"